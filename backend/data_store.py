@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+from typing import List, Optional, Type
+from pydantic import BaseModel
+
+# One lock for every store, since stores may share a connection
+STORE_LOCK = threading.Lock()
+
+def connect_store(path: str = ":memory:") -> sqlite3.Connection:
+    """Open the SQLite database shared by the record stores"""
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    # The default ":memory:" database is private to each process and ignores WAL. For a
+    # database file, WAL lets several uvicorn workers read while one of them writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+class SQLiteStore:
+    """Dict-style store of pydantic records kept in a SQLite table"""
+    
+    def __init__(self, connection: sqlite3.Connection, table: str, model_cls: Type[BaseModel]):
+        self.connection = connection
+        self.table = table
+        self.model_cls = model_cls
+        
+        with STORE_LOCK:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "id TEXT PRIMARY KEY, "
+                "created_at TEXT NOT NULL, "
+                "processed INTEGER NOT NULL DEFAULT 0, "
+                "payload TEXT NOT NULL)"
+            )
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_processed_created_at "
+                f"ON {table} (processed, created_at)"
+            )
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_created_at ON {table} (created_at)"
+            )
+    
+    def put(self, record: BaseModel):
+        """Insert or replace a record by id"""
+        with STORE_LOCK:
+            self.connection.execute(
+                f"INSERT INTO {self.table} (id, created_at, processed, payload) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET "
+                "created_at = excluded.created_at, processed = excluded.processed, payload = excluded.payload",
+                (
+                    record.id,
+                    record.created_at.isoformat(),
+                    int(getattr(record, 'processed', False)),
+                    record.model_dump_json()
+                )
+            )
+    
+    def get(self, record_id: str) -> Optional[BaseModel]:
+        """Load a record by id, or None if it is not stored"""
+        with STORE_LOCK:
+            row = self.connection.execute(
+                f"SELECT payload FROM {self.table} WHERE id = ?", (record_id,)
+            ).fetchone()
+        return self.model_cls.model_validate_json(row[0]) if row else None
+    
+    def recent(self, n: int) -> List[BaseModel]:
+        """Return the n newest records, oldest first"""
+        with STORE_LOCK:
+            rows = self.connection.execute(
+                f"SELECT payload FROM {self.table} ORDER BY created_at DESC, rowid DESC LIMIT ?", (n,)
+            ).fetchall()
+        return [self.model_cls.model_validate_json(row[0]) for row in reversed(rows)]
+    
+    def count(self) -> int:
+        """Return the number of stored records"""
+        with STORE_LOCK:
+            return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+    
+    def count_processed(self) -> int:
+        """Return the number of records flagged as processed"""
+        with STORE_LOCK:
+            return self.connection.execute(
+                f"SELECT COUNT(*) FROM {self.table} WHERE processed = 1"
+            ).fetchone()[0]
+    
+    def __contains__(self, record_id: str) -> bool:
+        with STORE_LOCK:
+            return self.connection.execute(
+                f"SELECT 1 FROM {self.table} WHERE id = ?", (record_id,)
+            ).fetchone() is not None
+    
+    def __getitem__(self, record_id: str) -> BaseModel:
+        record = self.get(record_id)
+        if record is None:
+            raise KeyError(record_id)
+        return record
+    
+    def __setitem__(self, record_id: str, record: BaseModel):
+        self.put(record)
+    
+    def __len__(self) -> int:
+        return self.count()
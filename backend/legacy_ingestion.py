@@ -1,33 +1,89 @@
 import re
+import io
 import json
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from itertools import chain, islice
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime
 import uuid
 from models import LegacyData, DataSourceType, FieldMapping, TableSchema
 
+DELIMITERS = [',', ';', '|', '\t', ' ']
+DELIMITER_BYTES = np.array([ord(delimiter) for delimiter in DELIMITERS])
+
+# Rows parsed per pandas chunk when reading flat files
+ROW_CHUNK_SIZE = 50000
+
+# Characters read per block when scanning flat files on disk
+FILE_BLOCK_SIZE = 1 << 20
+
+# Bytes that str.isspace() treats as whitespace in ASCII text
+ASCII_SPACE = np.zeros(256, dtype=bool)
+ASCII_SPACE[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = True
+
+SQL_COLUMN_RE = re.compile(r'(\w+)\s+(\w+(?:\(\d+(?:,\d+)?\))?)', re.IGNORECASE)
+SCREEN_FIELD_RE = re.compile(r'(\w+):[ \t\r\f\v]*([^\s]+)')
+
+# RPG specification letter -> (keyword the line must contain, entry type, section index)
+RPG_SECTIONS = {
+    'F': ('FILE', 'FILE', 0),
+    'D': ('DS', 'DS', 1),
+    'C': ('BEGSR', 'PROCEDURE', 2)
+}
+
+class _LineStream(io.TextIOBase):
+    """Read-only text stream over an iterator of lines, for readers that expect a file"""
+    
+    def __init__(self, lines: Iterator[str]):
+        """Wrap an iterator of lines that keep their trailing newline"""
+        self._lines = lines
+    
+    def readable(self) -> bool:
+        """The stream can only be read"""
+        return True
+    
+    def readline(self, size: int = -1) -> str:
+        """Return the next line, or '' once the lines run out"""
+        return next(self._lines, '')
+
 class AS400IngestionEngine:
     """Handles ingestion and parsing of various AS/400 data formats"""
     
     def __init__(self):
         self.field_patterns = {
-            'numeric': r'^\d+$',
-            'decimal': r'^\d+\.\d+$',
-            'date': r'^\d{6,8}$|^\d{4}-\d{2}-\d{2}$',
-            'time': r'^\d{6}$|^\d{2}:\d{2}:\d{2}$',
-            'varchar': r'^[A-Za-z0-9\s\-_]+$'
+            'numeric': re.compile(r'^\d+$'),
+            'decimal': re.compile(r'^\d+\.\d+$'),
+            'date': re.compile(r'^\d{6,8}$|^\d{4}-\d{2}-\d{2}$'),
+            'time': re.compile(r'^\d{6}$|^\d{2}:\d{2}:\d{2}$'),
+            'varchar': re.compile(r'^[A-Za-z0-9\s\-_]+$')
         }
     
     def parse_flat_file(self, content: str, filename: str) -> LegacyData:
         """Parse AS/400 flat file format"""
-        lines = content.strip().split('\n')
-        
         # Detect fixed-width format
-        if self._is_fixed_width(lines):
+        if self._is_fixed_width(self._line_lengths(content.strip())):
             return self._parse_fixed_width_file(content, filename)
         else:
             return self._parse_delimited_file(content, filename)
     
+    def parse_flat_file_path(self, path: str, filename: str) -> LegacyData:
+        """Parse AS/400 flat file straight from disk without building the whole text in memory"""
+        # Detect the format from streamed blocks; only '\n' ends a line, as in parse_flat_file
+        is_fixed_width = self._is_fixed_width(self._file_line_lengths(path))
+        with open(path, encoding='utf-8', newline='\n') as f:
+            lines = self._stripped_lines(f)
+            first_line = next(lines, '')
+            if not first_line:
+                return self._create_empty_legacy_data(filename, DataSourceType.FLAT_FILE)
+            
+            source = _LineStream(chain([first_line], lines))
+            if is_fixed_width:
+                field_positions = self._detect_field_positions([first_line.rstrip('\n')])
+                return self._read_fixed_width(source, filename, field_positions)
+            else:
+                return self._read_delimited(source, filename, first_line.rstrip('\n'))
+    
     def parse_db2_table(self, content: str, table_name: str) -> LegacyData:
         """Parse DB2 table structure from DDS or SQL"""
         if 'CREATE TABLE' in content.upper():
@@ -47,7 +103,7 @@ class AS400IngestionEngine:
         }
         
         return LegacyData(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4().hex,
             source_type=DataSourceType.GREEN_SCREEN,
             content=content,
             metadata=metadata,
@@ -57,9 +113,7 @@ class AS400IngestionEngine:
     def parse_rpg_program(self, content: str, program_name: str) -> LegacyData:
         """Parse RPG program structure"""
         # Extract file definitions, data structures, and procedures
-        file_defs = self._extract_file_definitions(content)
-        data_structs = self._extract_data_structures(content)
-        procedures = self._extract_procedures(content)
+        file_defs, data_structs, procedures = self._extract_rpg_sections(content)
         
         metadata = {
             'program_name': program_name,
@@ -69,107 +123,208 @@ class AS400IngestionEngine:
         }
         
         return LegacyData(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4().hex,
             source_type=DataSourceType.RPG_PROGRAM,
             content=content,
             metadata=metadata,
             created_at=datetime.now()
         )
     
-    def _is_fixed_width(self, lines: List[str]) -> bool:
-        """Detect if file is fixed-width format"""
-        if not lines:
-            return False
-        
+    def _line_lengths(self, text: str) -> np.ndarray:
+        """Lengths of the non-blank lines of text"""
+        if not text.isascii():
+            return np.fromiter((len(line) for line in text.split('\n') if line.strip()), dtype=np.int64)
+        
+        # ASCII text: find every newline in one vectorized pass instead of
+        # materializing a string per line
+        arr = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        breaks = np.flatnonzero(arr == 10)
+        starts = np.concatenate(([0], breaks + 1))
+        ends = np.concatenate((breaks, [arr.size]))
+        
+        # A line is blank when it holds no non-space bytes
+        non_space = np.concatenate(([0], np.cumsum(~ASCII_SPACE[arr])))
+        return (ends - starts)[non_space[ends] > non_space[starts]]
+    
+    def _file_line_lengths(self, path: str) -> np.ndarray:
+        """Lengths of the non-blank lines of a file, read in blocks"""
+        lengths = []
+        carry = ''
+        # Blank space that parse_flat_file's strip() cuts from the first and last non-blank lines
+        leading = None
+        trailing = 0
+        
+        def measure(part: str):
+            nonlocal leading, trailing
+            lengths.append(self._line_lengths(part))
+            end = len(part.rstrip())
+            if end:
+                if leading is None:
+                    start = len(part) - len(part.lstrip())
+                    leading = start - (part.rfind('\n', 0, start) + 1)
+                line_end = part.find('\n', end)
+                trailing = (len(part) if line_end == -1 else line_end) - end
+        
+        with open(path, encoding='utf-8', newline='\n') as f:
+            while block := f.read(FILE_BLOCK_SIZE):
+                # Measure the complete lines and carry the unfinished one into the next block
+                block = carry + block
+                cut = block.rfind('\n') + 1
+                measure(block[:cut])
+                carry = block[cut:]
+        measure(carry)
+        
+        lengths = np.concatenate(lengths)
+        if lengths.size:
+            lengths[0] -= leading
+            lengths[-1] -= trailing
+        return lengths
+    
+    def _stripped_lines(self, f) -> Iterator[str]:
+        """Lines of f as io.StringIO(text.strip()) would yield them, without reading f whole"""
+        first = next((line for line in f if line.strip()), None)
+        if first is None:
+            return
+        
+        # Hold the last non-blank line and any blank lines after it until more text follows,
+        # so trailing blank space can be dropped at the end like strip() does
+        pending = [first.lstrip()]
+        for line in f:
+            if line.strip():
+                yield from pending
+                pending = [line]
+            else:
+                pending.append(line)
+        yield pending[0].rstrip()
+    
+    def _is_fixed_width(self, lengths: np.ndarray) -> bool:
+        """Detect if file is fixed-width format from its non-blank line lengths"""
         # Check if all lines have similar length (within 10% variance)
-        lengths = [len(line) for line in lines if line.strip()]
-        if not lengths:
+        if lengths.size == 0:
             return False
         
-        avg_length = sum(lengths) / len(lengths)
-        variance = sum(abs(length - avg_length) for length in lengths) / len(lengths)
-        return variance < avg_length * 0.1
+        avg_length = lengths.mean()
+        variance = np.abs(lengths - avg_length).mean()
+        return bool(variance < avg_length * 0.1)
     
     def _parse_fixed_width_file(self, content: str, filename: str) -> LegacyData:
         """Parse fixed-width flat file"""
-        lines = content.strip().split('\n')
-        if not lines:
+        # Analyze column positions; only the first line is used as the reference
+        field_positions = self._detect_field_positions([content.strip().split('\n', 1)[0]])
+        if not field_positions:
             return self._create_empty_legacy_data(filename, DataSourceType.FLAT_FILE)
         
-        # Analyze column positions
-        field_positions = self._detect_field_positions(lines)
-        
-        # Parse data into structured format
-        parsed_data = []
-        for line in lines:
-            if line.strip():
-                row = {}
-                for field_name, (start, end) in field_positions.items():
-                    value = line[start:end].strip()
-                    row[field_name] = value
-                parsed_data.append(row)
+        return self._read_fixed_width(io.StringIO(content.strip()), filename, field_positions)
+    
+    def _read_fixed_width(self, source, filename: str, field_positions: Dict[str, tuple]) -> LegacyData:
+        """Read fixed-width rows from a text stream"""
+        # Parse data into structured format with the pandas fixed-width reader
+        chunks = pd.read_fwf(
+            source,
+            colspecs=list(field_positions.values()),
+            names=list(field_positions.keys()),
+            header=None,
+            dtype=str,
+            keep_default_na=False,
+            na_filter=False,
+            skip_blank_lines=True,
+            chunksize=ROW_CHUNK_SIZE
+        )
+        _, row_count, sample_data, rows_json = self._collect_rows(
+            chunk.apply(lambda column: column.str.strip()) for chunk in chunks
+        )
         
         metadata = {
             'filename': filename,
             'format': 'fixed_width',
             'field_positions': field_positions,
-            'row_count': len(parsed_data),
-            'sample_data': parsed_data[:5]  # First 5 rows as sample
+            'row_count': row_count,
+            'sample_data': sample_data  # First 5 rows as sample
         }
         
         return LegacyData(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4().hex,
             source_type=DataSourceType.FLAT_FILE,
-            content=json.dumps(parsed_data),
+            content=rows_json,
             metadata=metadata,
             created_at=datetime.now()
         )
     
     def _parse_delimited_file(self, content: str, filename: str) -> LegacyData:
         """Parse delimited flat file"""
-        lines = content.strip().split('\n')
-        if not lines:
+        if not content.strip():
             return self._create_empty_legacy_data(filename, DataSourceType.FLAT_FILE)
         
+        header_line = content.strip().split('\n', 1)[0]
+        return self._read_delimited(io.StringIO(content.strip()), filename, header_line)
+    
+    def _read_delimited(self, source, filename: str, header_line: str) -> LegacyData:
+        """Read delimited rows from a text stream"""
         # Detect delimiter
-        delimiter = self._detect_delimiter(lines[0])
-        
-        # Parse CSV-like data
-        parsed_data = []
-        headers = lines[0].split(delimiter)
-        
-        for line in lines[1:]:
-            if line.strip():
-                values = line.split(delimiter)
-                row = dict(zip(headers, values))
-                parsed_data.append(row)
+        delimiter = self._detect_delimiter(header_line)
+        
+        # Split each line on the delimiter as plain text: duplicate headers keep
+        # the last value, short rows leave out the missing keys and extra
+        # trailing fields are dropped
+        headers = header_line.split(delimiter)
+        row_count = 0
+        sample_data = []
+        parts = []
+        
+        # Rows are built and serialized one chunk at a time
+        with source as f:
+            lines = (line.rstrip('\n') for line in f if line.strip())
+            next(lines, None)
+            for batch in iter(lambda: list(islice(lines, ROW_CHUNK_SIZE)), []):
+                rows = [dict(zip(headers, line.split(delimiter))) for line in batch]
+                if len(sample_data) < 5:
+                    sample_data.extend(rows[:5 - len(sample_data)])
+                row_count += len(rows)
+                parts.append(json.dumps(rows)[1:-1])
+        rows_json = '[' + ','.join(parts) + ']'
         
         metadata = {
             'filename': filename,
             'format': 'delimited',
             'delimiter': delimiter,
             'headers': headers,
-            'row_count': len(parsed_data),
-            'sample_data': parsed_data[:5]
+            'row_count': row_count,
+            'sample_data': sample_data
         }
         
         return LegacyData(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4().hex,
             source_type=DataSourceType.FLAT_FILE,
-            content=json.dumps(parsed_data),
+            content=rows_json,
             metadata=metadata,
             created_at=datetime.now()
         )
     
+    def _collect_rows(self, chunks) -> Tuple[List[str], int, List[Dict[str, Any]], str]:
+        """Stream DataFrame chunks into headers, row count, sample rows and a JSON array"""
+        headers = []
+        row_count = 0
+        sample_data = []
+        parts = []
+        
+        # Only one chunk of rows is held at a time; each is serialized as soon as it is read
+        for chunk in chunks:
+            if not headers:
+                headers = chunk.columns.tolist()
+            if len(sample_data) < 5:
+                sample_data.extend(chunk.head(5 - len(sample_data)).to_dict('records'))
+            if len(chunk):
+                row_count += len(chunk)
+                parts.append(chunk.to_json(orient='records')[1:-1])
+        
+        return headers, row_count, sample_data, '[' + ','.join(parts) + ']'
+    
     def _detect_delimiter(self, line: str) -> str:
         """Detect delimiter in delimited file"""
-        delimiters = [',', ';', '|', '\t', ' ']
-        delimiter_counts = {}
-        
-        for delimiter in delimiters:
-            delimiter_counts[delimiter] = line.count(delimiter)
-        
-        return max(delimiter_counts, key=delimiter_counts.get)
+        # Count every byte in one pass; the candidates are ASCII, so UTF-8
+        # continuation bytes can never be mistaken for a delimiter
+        counts = np.bincount(np.frombuffer(line.encode('utf-8'), dtype=np.uint8), minlength=256)
+        return DELIMITERS[int(np.argmax(counts[DELIMITER_BYTES]))]
     
     def _detect_field_positions(self, lines: List[str]) -> Dict[str, tuple]:
         """Detect field positions in fixed-width file"""
@@ -178,33 +333,22 @@ class AS400IngestionEngine:
         
         # Use the first line as reference
         reference_line = lines[0]
-        field_positions = {}
         
-        # Simple heuristic: look for patterns of spaces and non-spaces
-        current_pos = 0
-        field_num = 1
+        # Classify every character at once; ASCII lines go through a byte lookup table
+        if reference_line.isascii():
+            is_space = ASCII_SPACE[np.frombuffer(reference_line.encode('ascii'), dtype=np.uint8)]
+        else:
+            is_space = np.fromiter(map(str.isspace, reference_line), dtype=bool, count=len(reference_line))
         
-        while current_pos < len(reference_line):
-            # Find start of next field (non-space character)
-            start = current_pos
-            while start < len(reference_line) and reference_line[start].isspace():
-                start += 1
-            
-            if start >= len(reference_line):
-                break
-            
-            # Find end of field (space character or end of line)
-            end = start
-            while end < len(reference_line) and not reference_line[end].isspace():
-                end += 1
-            
-            field_name = f"FIELD_{field_num}"
-            field_positions[field_name] = (start, end)
-            
-            current_pos = end
-            field_num += 1
+        # Fields are runs of non-space characters; +1/-1 steps mark their starts and ends
+        edges = np.diff(np.concatenate(([False], ~is_space, [False])).astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
         
-        return field_positions
+        return {
+            f"FIELD_{field_num}": (int(start), int(end))
+            for field_num, (start, end) in enumerate(zip(starts, ends), 1)
+        }
     
     def _parse_sql_table(self, content: str, table_name: str) -> LegacyData:
         """Parse SQL CREATE TABLE statement"""
@@ -218,7 +362,7 @@ class AS400IngestionEngine:
         }
         
         return LegacyData(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4().hex,
             source_type=DataSourceType.DB2_TABLE,
             content=content,
             metadata=metadata,
@@ -237,7 +381,7 @@ class AS400IngestionEngine:
         }
         
         return LegacyData(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4().hex,
             source_type=DataSourceType.DB2_TABLE,
             content=content,
             metadata=metadata,
@@ -248,8 +392,7 @@ class AS400IngestionEngine:
         """Extract column definitions from SQL"""
         columns = []
         # Simple regex to find column definitions
-        pattern = r'(\w+)\s+(\w+(?:\(\d+(?:,\d+)?\))?)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
+        matches = SQL_COLUMN_RE.findall(content)
         
         for name, data_type in matches:
             columns.append({
@@ -285,85 +428,60 @@ class AS400IngestionEngine:
     def _extract_screen_fields(self, content: str) -> List[Dict[str, Any]]:
         """Extract field information from green screen"""
         fields = []
-        lines = content.split('\n')
-        
-        for line in lines:
-            # Look for field indicators (common in AS/400 screens)
-            if '===' in line or '---' in line:
+        line_start = 0
+        line_end = -1
+        is_divider = False
+        
+        # One pass over the whole screen; the pattern never crosses a newline
+        for match in SCREEN_FIELD_RE.finditer(content):
+            start = match.start()
+            if start > line_end:
+                line_start = content.rfind('\n', 0, start) + 1
+                line_end = content.find('\n', start)
+                if line_end == -1:
+                    line_end = len(content)
+                # Look for field indicators (common in AS/400 screens)
+                line = content[line_start:line_end]
+                is_divider = '===' in line or '---' in line
+            
+            if is_divider:
                 continue
             
             # Extract field names and positions
-            field_matches = re.findall(r'(\w+):\s*([^\s]+)', line)
-            for field_name, field_value in field_matches:
-                fields.append({
-                    'name': field_name,
-                    'value': field_value,
-                    'position': line.find(field_name)
-                })
+            fields.append({
+                'name': match.group(1),
+                'value': match.group(2),
+                'position': start - line_start
+            })
         
         return fields
     
-    def _extract_file_definitions(self, content: str) -> List[Dict[str, Any]]:
-        """Extract file definitions from RPG program"""
-        file_defs = []
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('F') and 'FILE' in line.upper():
-                # Parse file definition
-                parts = line.split()
-                if len(parts) >= 2:
-                    file_defs.append({
-                        'name': parts[1],
-                        'type': 'FILE',
-                        'definition': line
-                    })
-        
-        return file_defs
-    
-    def _extract_data_structures(self, content: str) -> List[Dict[str, Any]]:
-        """Extract data structures from RPG program"""
-        data_structs = []
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('D') and 'DS' in line.upper():
-                # Parse data structure definition
-                parts = line.split()
-                if len(parts) >= 2:
-                    data_structs.append({
-                        'name': parts[1],
-                        'type': 'DS',
-                        'definition': line
-                    })
-        
-        return data_structs
-    
-    def _extract_procedures(self, content: str) -> List[Dict[str, Any]]:
-        """Extract procedures from RPG program"""
-        procedures = []
-        lines = content.split('\n')
+    def _extract_rpg_sections(self, content: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Extract file definitions, data structures and procedures from RPG program in one pass"""
+        sections = ([], [], [])
         
-        for line in lines:
+        for line in content.split('\n'):
             line = line.strip()
-            if line.startswith('C') and 'BEGSR' in line.upper():
-                # Parse procedure start
+            spec = RPG_SECTIONS.get(line[:1])
+            if spec is None:
+                continue
+            
+            keyword, entry_type, index = spec
+            if keyword in line.upper():
                 parts = line.split()
                 if len(parts) >= 2:
-                    procedures.append({
+                    sections[index].append({
                         'name': parts[1],
-                        'type': 'PROCEDURE',
+                        'type': entry_type,
                         'definition': line
                     })
         
-        return procedures
+        return sections
     
     def _create_empty_legacy_data(self, filename: str, source_type: DataSourceType) -> LegacyData:
         """Create empty legacy data for empty files"""
         return LegacyData(
-            id=str(uuid.uuid4()),
+            id=uuid.uuid4().hex,
             source_type=source_type,
             content="",
             metadata={'filename': filename, 'empty': True},
@@ -1,18 +1,47 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import List, Dict, Any, Optional
+from fastapi.responses import JSONResponse, ORJSONResponse
+from typing import Callable, List, Dict, Any, Optional
+import codecs
 import json
 import os
+import tempfile
+import time
 from datetime import datetime
 import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 
 from models import *
 from legacy_ingestion import AS400IngestionEngine
 from ai_transformer import AITransformationEngine
 from websocket_handler import manager
+from data_store import SQLiteStore, connect_store
 
-app = FastAPI(title="AS/400 Legacy Modernization Assistant", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Broadcast WebSocket updates from a background task instead of the request path
+    manager.start()
+    # Parse large uploads in worker processes so they don't block the event loop; workers are
+    # spawned rather than forked so they don't inherit the store connection, locks or HTTP pool
+    app.state.parse_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    yield
+    app.state.parse_pool.shutdown(wait=False, cancel_futures=True)
+    app.state.parse_pool = None
+    await manager.stop()
+    # Release the pooled OpenAI connections on shutdown
+    await ai_engine.aclose()
+
+app = FastAPI(
+    title="AS/400 Legacy Modernization Assistant",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -27,9 +56,37 @@ app.add_middleware(
 ingestion_engine = AS400IngestionEngine()
 ai_engine = AITransformationEngine(api_key=os.getenv("OPENAI_API_KEY"))
 
-# In-memory storage for demo (in production, use a database)
-legacy_data_store: Dict[str, LegacyData] = {}
-modernized_data_store: Dict[str, ModernizedData] = {}
+# Uploads larger than this are spooled to disk in chunks instead of read whole
+UPLOAD_SPOOL_THRESHOLD = 1 << 20
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Inputs smaller than this are parsed in a thread; shipping them to a worker process
+# and the result back costs more than the parse itself
+PROCESS_PARSE_THRESHOLD = 1 << 20
+
+# Database type prefix -> OpenAPI type, checked in order
+OPENAPI_TYPE_PREFIXES = {
+    "VARCHAR": "string",
+    "TEXT": "string",
+    "INTEGER": "integer",
+    "BIGINT": "integer",
+    "DECIMAL": "number",
+    "FLOAT": "number",
+    "DATE": "string",
+    "TIMESTAMP": "string",
+    "BOOLEAN": "boolean"
+}
+
+# SQLite-backed storage; point LEGACY_STORE_PATH at a file to share it between workers
+store_connection = connect_store(os.getenv("LEGACY_STORE_PATH", ":memory:"))
+legacy_data_store = SQLiteStore(store_connection, "legacy_data", LegacyData)
+modernized_data_store = SQLiteStore(store_connection, "modernized_data", ModernizedData)
+
+# Dashboard snapshot, reused for up to DASHBOARD_CACHE_TTL seconds until the next write.
+# It is per process, so with a shared LEGACY_STORE_PATH a worker may serve a dashboard
+# that is up to DASHBOARD_CACHE_TTL seconds behind another worker's writes
+DASHBOARD_CACHE_TTL = 1.0
+dashboard_cache = {"value": None, "timestamp": 0.0, "dirty": True}
 
 @app.get("/")
 async def root():
@@ -40,6 +97,7 @@ async def root():
             "upload": "/upload",
             "ingest": "/ingest",
             "transform": "/transform/{legacy_id}",
+            "transform_batch": "/transform",
             "query": "/query/{modernized_id}",
             "microservices": "/microservices/{modernized_id}",
             "dashboard": "/dashboard"
@@ -49,27 +107,26 @@ async def root():
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     """Upload and process AS/400 files"""
+    spool_path = None
     try:
-        content = await file.read()
-        content_str = content.decode("utf-8")
-        
-        # Determine file type and process accordingly
         filename = file.filename.lower()
         
-        if filename.endswith('.txt') or filename.endswith('.dat'):
-            legacy_data = ingestion_engine.parse_flat_file(content_str, file.filename)
-        elif filename.endswith('.sql') or 'create table' in content_str.lower():
-            legacy_data = ingestion_engine.parse_db2_table(content_str, file.filename)
-        elif 'screen' in filename or 'display' in filename:
-            legacy_data = ingestion_engine.parse_green_screen(content_str, file.filename)
-        elif filename.endswith('.rpg') or filename.endswith('.rpgle'):
-            legacy_data = ingestion_engine.parse_rpg_program(content_str, file.filename)
+        if file.size is not None and file.size > UPLOAD_SPOOL_THRESHOLD and _is_flat_file_upload(filename, False):
+            # Large flat files are parsed straight from disk by pandas
+            spool_path, has_create_table = await _spool_upload(file)
+            if _is_flat_file_upload(filename, has_create_table):
+                legacy_data = await _run_parser(ingestion_engine.parse_flat_file_path, spool_path, file.filename, file.size)
+            else:
+                with open(spool_path, encoding="utf-8") as spooled:
+                    content_str = spooled.read()
+                legacy_data = await _run_parser(_select_upload_parser(content_str, file.filename), content_str, file.filename)
         else:
-            # Default to flat file
-            legacy_data = ingestion_engine.parse_flat_file(content_str, file.filename)
+            content_str = await _read_upload_text(file)
+            legacy_data = await _run_parser(_select_upload_parser(content_str, file.filename), content_str, file.filename)
         
         # Store the legacy data
         legacy_data_store[legacy_data.id] = legacy_data
+        _invalidate_dashboard()
         
         # Send real-time update
         await manager.send_processing_update(legacy_data.id, "uploaded", 25)
@@ -85,6 +142,9 @@ async def upload_file(file: UploadFile = File(...)):
     except Exception as e:
         await manager.send_error(f"Error processing file: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+    finally:
+        if spool_path:
+            os.unlink(spool_path)
 
 @app.post("/ingest")
 async def ingest_legacy_data(
@@ -95,17 +155,20 @@ async def ingest_legacy_data(
     """Ingest legacy data directly"""
     try:
         if source_type == DataSourceType.FLAT_FILE:
-            legacy_data = ingestion_engine.parse_flat_file(content, name)
+            parser = ingestion_engine.parse_flat_file
         elif source_type == DataSourceType.DB2_TABLE:
-            legacy_data = ingestion_engine.parse_db2_table(content, name)
+            parser = ingestion_engine.parse_db2_table
         elif source_type == DataSourceType.GREEN_SCREEN:
-            legacy_data = ingestion_engine.parse_green_screen(content, name)
+            parser = ingestion_engine.parse_green_screen
         elif source_type == DataSourceType.RPG_PROGRAM:
-            legacy_data = ingestion_engine.parse_rpg_program(content, name)
+            parser = ingestion_engine.parse_rpg_program
         else:
             raise HTTPException(status_code=400, detail="Invalid source type")
         
+        legacy_data = await _run_parser(parser, content, name)
+        
         legacy_data_store[legacy_data.id] = legacy_data
+        _invalidate_dashboard()
         
         return {
             "success": True,
@@ -135,8 +198,9 @@ async def transform_legacy_data(legacy_id: str):
         modernized_data_store[modernized_data.id] = modernized_data
         
         # Mark legacy data as processed
-        legacy_data.processed = True
+        legacy_data = legacy_data.model_copy(update={"processed": True})
         legacy_data_store[legacy_id] = legacy_data
+        _invalidate_dashboard()
         
         # Send completion notification
         await manager.send_transformation_complete(
@@ -146,15 +210,15 @@ async def transform_legacy_data(legacy_id: str):
             len(modernized_data.microservices)
         )
         
-        # Send dashboard update
-        dashboard_data = get_dashboard_data()
-        await manager.send_dashboard_update(dashboard_data)
+        # Send dashboard update, skipping the dashboard queries when nobody is listening
+        if manager.has_listeners:
+            await manager.send_dashboard_update(get_dashboard_data())
         
         return {
             "success": True,
             "modernized_id": modernized_data.id,
             "legacy_id": legacy_id,
-            "schema": modernized_data.modern_schema.dict(),
+            "schema": modernized_data.modern_schema.model_dump(mode="json"),
             "api_count": len(modernized_data.api_specs),
             "microservices_count": len(modernized_data.microservices),
             "transformation_log": modernized_data.transformation_log
@@ -164,6 +228,50 @@ async def transform_legacy_data(legacy_id: str):
         await manager.send_error(f"Error transforming data: {str(e)}", legacy_id)
         raise HTTPException(status_code=500, detail=f"Error transforming data: {str(e)}")
 
+@app.post("/transform")
+async def transform_legacy_data_batch(batch_request: TransformBatchRequest):
+    """Transform several legacy items, batching their AI analysis requests"""
+    # Check the ids before the try so a 404 is not turned into a 500
+    missing = [legacy_id for legacy_id in batch_request.legacy_ids if legacy_id not in legacy_data_store]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Legacy data not found: {', '.join(missing)}")
+    
+    try:
+        legacy_items = [legacy_data_store[legacy_id] for legacy_id in batch_request.legacy_ids]
+        modernized_items = await ai_engine.transform_legacy_data_batch(legacy_items)
+        
+        results = []
+        for legacy_data, modernized_data in zip(legacy_items, modernized_items):
+            # Store the modernized data and mark legacy data as processed
+            modernized_data_store[modernized_data.id] = modernized_data
+            legacy_data_store[legacy_data.id] = legacy_data.model_copy(update={"processed": True})
+            
+            await manager.send_transformation_complete(
+                legacy_data.id,
+                modernized_data.id,
+                len(modernized_data.api_specs),
+                len(modernized_data.microservices)
+            )
+            results.append({
+                "modernized_id": modernized_data.id,
+                "legacy_id": legacy_data.id,
+                "api_count": len(modernized_data.api_specs),
+                "microservices_count": len(modernized_data.microservices)
+            })
+        _invalidate_dashboard()
+        
+        if manager.has_listeners:
+            await manager.send_dashboard_update(get_dashboard_data())
+        
+        return {
+            "success": True,
+            "results": results
+        }
+        
+    except Exception as e:
+        await manager.send_error(f"Error transforming data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error transforming data: {str(e)}")
+
 @app.get("/legacy/{legacy_id}")
 async def get_legacy_data(legacy_id: str):
     """Get legacy data details"""
@@ -185,16 +293,17 @@ async def get_modernized_data(modernized_id: str):
     if modernized_id not in modernized_data_store:
         raise HTTPException(status_code=404, detail="Modernized data not found")
     
-    modernized_data = modernized_data_store[modernized_id]
-    return {
-        "id": modernized_data.id,
-        "legacy_id": modernized_data.legacy_id,
-        "schema": modernized_data.modern_schema.dict(),
-        "api_specs": [spec.dict() for spec in modernized_data.api_specs],
-        "microservices": [ms.dict() for ms in modernized_data.microservices],
-        "transformation_log": modernized_data.transformation_log,
-        "created_at": modernized_data.created_at
-    }
+    # One pydantic-core pass produces JSON-ready data, so the response skips jsonable_encoder
+    data = modernized_data_store[modernized_id].model_dump(mode="json")
+    return ORJSONResponse({
+        "id": data["id"],
+        "legacy_id": data["legacy_id"],
+        "schema": data["modern_schema"],
+        "api_specs": data["api_specs"],
+        "microservices": data["microservices"],
+        "transformation_log": data["transformation_log"],
+        "created_at": data["created_at"]
+    })
 
 @app.post("/query/{modernized_id}")
 async def query_modernized_data(modernized_id: str, query_request: QueryRequest):
@@ -224,22 +333,26 @@ async def get_microservices(modernized_id: str):
         raise HTTPException(status_code=404, detail="Modernized data not found")
     
     modernized_data = modernized_data_store[modernized_id]
-    return {
-        "microservices": [ms.dict() for ms in modernized_data.microservices],
+    return ORJSONResponse({
+        "microservices": modernized_data.model_dump(mode="json", include={"microservices"})["microservices"],
         "architecture_diagram": _generate_architecture_diagram(modernized_data.microservices)
-    }
+    })
 
 @app.get("/dashboard")
 def get_dashboard_data():
     """Get dashboard overview data"""
-    total_legacy = len(legacy_data_store)
-    total_modernized = len(modernized_data_store)
-    processed_count = sum(1 for data in legacy_data_store.values() if data.processed)
+    now = time.monotonic()
+    if not dashboard_cache["dirty"] and now - dashboard_cache["timestamp"] < DASHBOARD_CACHE_TTL:
+        return dashboard_cache["value"]
     
-    recent_legacy = list(legacy_data_store.values())[-5:] if legacy_data_store else []
-    recent_modernized = list(modernized_data_store.values())[-5:] if modernized_data_store else []
+    total_legacy = legacy_data_store.count()
+    total_modernized = modernized_data_store.count()
+    processed_count = legacy_data_store.count_processed()
     
-    return {
+    recent_legacy = legacy_data_store.recent(5)
+    recent_modernized = modernized_data_store.recent(5)
+    
+    dashboard = {
         "overview": {
             "total_legacy_files": total_legacy,
             "total_modernized": total_modernized,
@@ -260,6 +373,13 @@ def get_dashboard_data():
             "created_at": data.created_at
         } for data in recent_modernized]
     }
+    
+    dashboard_cache.update(value=dashboard, timestamp=now, dirty=False)
+    return dashboard
+
+def _invalidate_dashboard():
+    """Force the next dashboard request to re-query the stores"""
+    dashboard_cache["dirty"] = True
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -335,58 +455,119 @@ async def get_api_specs(modernized_id: str):
 
 def _generate_sample_data(schema: TableSchema, query_request: QueryRequest) -> List[Dict[str, Any]]:
     """Generate sample data for demonstration"""
-    sample_data = []
-    
-    for i in range(min(query_request.limit, 10)):  # Generate up to 10 sample records
-        record = {}
-        for field in schema.fields:
-            if field.data_type.startswith("VARCHAR"):
-                record[field.modern_field] = f"Sample {field.modern_field} {i+1}"
-            elif field.data_type.startswith("INTEGER"):
-                record[field.modern_field] = (i + 1) * 100
-            elif field.data_type.startswith("DECIMAL"):
-                record[field.modern_field] = round((i + 1) * 10.5, 2)
-            elif field.data_type.startswith("DATE"):
-                record[field.modern_field] = "2024-01-01"
-            elif field.data_type.startswith("TIMESTAMP"):
-                record[field.modern_field] = "2024-01-01T10:00:00Z"
-            else:
-                record[field.modern_field] = f"Value {i+1}"
-        
-        sample_data.append(record)
+    # Resolve each field's value generator once instead of probing type prefixes per row
+    generators = {field.modern_field: _sample_value_generator(field) for field in schema.fields}
     
-    return sample_data
+    # Generate up to 10 sample records
+    return [
+        {name: generate(i) for name, generate in generators.items()}
+        for i in range(min(query_request.limit, 10))
+    ]
+
+def _sample_value_generator(field: FieldMapping):
+    """Pick the sample value generator for a field's data type"""
+    name = field.modern_field
+    if field.data_type.startswith("VARCHAR"):
+        return lambda i: f"Sample {name} {i+1}"
+    elif field.data_type.startswith("INTEGER"):
+        return lambda i: (i + 1) * 100
+    elif field.data_type.startswith("DECIMAL"):
+        return lambda i: round((i + 1) * 10.5, 2)
+    elif field.data_type.startswith("DATE"):
+        return lambda i: "2024-01-01"
+    elif field.data_type.startswith("TIMESTAMP"):
+        return lambda i: "2024-01-01T10:00:00Z"
+    else:
+        return lambda i: f"Value {i+1}"
 
 def _generate_architecture_diagram(microservices: List[Microservice]) -> str:
     """Generate Mermaid diagram for microservices architecture"""
-    diagram = "graph TD\n"
+    # Map each service name to its node id once so edges are dict lookups
+    service_ids = {}
+    for i, service in enumerate(microservices):
+        service_ids.setdefault(service.name, f"service_{i}")
     
+    parts = ["graph TD\n"]
     for i, service in enumerate(microservices):
         service_id = f"service_{i}"
-        diagram += f'    {service_id}["{service.name}"]\n'
+        parts.append(f'    {service_id}["{service.name}"]\n')
         
         for dep in service.dependencies:
-            dep_id = f"service_{microservices.index(next(ms for ms in microservices if ms.name == dep))}"
-            diagram += f"    {dep_id} --> {service_id}\n"
+            dep_id = service_ids.get(dep)
+            # Dependencies outside the suggested services have no node to link
+            if dep_id is not None:
+                parts.append(f"    {dep_id} --> {service_id}\n")
     
-    return diagram
+    return "".join(parts)
 
 def _map_data_type_to_openapi(data_type: str) -> str:
     """Map database data type to OpenAPI type"""
-    if data_type.startswith("VARCHAR") or data_type.startswith("TEXT"):
-        return "string"
-    elif data_type.startswith("INTEGER") or data_type.startswith("BIGINT"):
-        return "integer"
-    elif data_type.startswith("DECIMAL") or data_type.startswith("FLOAT"):
-        return "number"
-    elif data_type.startswith("DATE"):
-        return "string"
-    elif data_type.startswith("TIMESTAMP"):
-        return "string"
-    elif data_type.startswith("BOOLEAN"):
-        return "boolean"
+    return next(
+        (openapi_type for prefix, openapi_type in OPENAPI_TYPE_PREFIXES.items() if data_type.startswith(prefix)),
+        "string"
+    )
+
+def _select_upload_parser(content_str: str, original_filename: str) -> Callable[[str, str], LegacyData]:
+    """Determine file type and pick the parser for it"""
+    filename = original_filename.lower()
+    
+    if filename.endswith('.txt') or filename.endswith('.dat'):
+        return ingestion_engine.parse_flat_file
+    elif filename.endswith('.sql') or 'create table' in content_str.lower():
+        return ingestion_engine.parse_db2_table
+    elif 'screen' in filename or 'display' in filename:
+        return ingestion_engine.parse_green_screen
+    elif filename.endswith('.rpg') or filename.endswith('.rpgle'):
+        return ingestion_engine.parse_rpg_program
     else:
-        return "string"
+        # Default to flat file
+        return ingestion_engine.parse_flat_file
+
+async def _run_parser(parser: Callable[[str, str], LegacyData], content: str, name: str, size: Optional[int] = None) -> LegacyData:
+    """Run a CPU-bound parser in the process pool for large inputs, in a thread for small ones,
+    or inline when the pool isn't running; size defaults to the length of content"""
+    pool = getattr(app.state, "parse_pool", None)
+    if pool is None:
+        return parser(content, name)
+    if (len(content) if size is None else size) < PROCESS_PARSE_THRESHOLD:
+        return await asyncio.to_thread(parser, content, name)
+    return await asyncio.get_running_loop().run_in_executor(pool, parser, content, name)
+
+def _is_flat_file_upload(filename: str, has_create_table: bool) -> bool:
+    """Mirror _select_upload_parser's dispatch for a spooled upload"""
+    if filename.endswith('.txt') or filename.endswith('.dat'):
+        return True
+    return not (
+        filename.endswith('.sql') or has_create_table
+        or 'screen' in filename or 'display' in filename
+        or filename.endswith('.rpg') or filename.endswith('.rpgle')
+    )
+
+async def _read_upload_text(file: UploadFile) -> str:
+    """Decode an upload as UTF-8 chunk by chunk instead of holding the whole byte string"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts = []
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+async def _spool_upload(file: UploadFile):
+    """Copy an upload to a temporary file in chunks, noting whether it contains CREATE TABLE"""
+    marker = b'create table'
+    tail = b''
+    has_create_table = False
+    
+    with tempfile.NamedTemporaryFile(delete=False) as tmp:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            tmp.write(chunk)
+            if not has_create_table:
+                # Keep the end of the previous chunk so a marker split across chunks is found
+                window = tail + chunk.lower()
+                has_create_table = marker in window
+                tail = window[-(len(marker) - 1):]
+    
+    return tmp.name, has_create_table
 
 if __name__ == "__main__":
     try:
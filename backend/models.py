@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from dataclasses import dataclass, field
+from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from enum import Enum
@@ -10,6 +11,8 @@ class DataSourceType(str, Enum):
     RPG_PROGRAM = "rpg_program"
 
 class FieldMapping(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     legacy_field: str
     modern_field: str
     data_type: str
@@ -17,26 +20,32 @@ class FieldMapping(BaseModel):
     transformation_rule: Optional[str] = None
 
 class TableSchema(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     table_name: str
     fields: List[FieldMapping]
     primary_key: List[str]
     indexes: List[str] = []
 
-class APISpec(BaseModel):
+@dataclass(frozen=True, slots=True)
+class APISpec:
     endpoint: str
     method: str
     description: str
     parameters: List[Dict[str, Any]]
     response_schema: Dict[str, Any]
 
-class Microservice(BaseModel):
+@dataclass(frozen=True, slots=True)
+class Microservice:
     name: str
     description: str
     endpoints: List[APISpec]
-    dependencies: List[str] = []
+    dependencies: List[str] = field(default_factory=list)
     dockerfile: Optional[str] = None
 
 class LegacyData(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     id: str
     source_type: DataSourceType
     content: str
@@ -45,6 +54,8 @@ class LegacyData(BaseModel):
     processed: bool = False
 
 class ModernizedData(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     id: str
     legacy_id: str
     modern_schema: TableSchema
@@ -59,7 +70,12 @@ class QueryRequest(BaseModel):
     limit: int = 100
     offset: int = 0
 
+class TransformBatchRequest(BaseModel):
+    legacy_ids: List[str]
+
 class QueryResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    
     data: List[Dict[str, Any]]
     total_count: int
     query_time: float
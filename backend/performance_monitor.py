@@ -6,12 +6,28 @@ import time
 import psutil
 import asyncio
 import json
+import orjson
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Any
 from dataclasses import dataclass
 import logging
+import threading
 
-@dataclass
+# Request times kept for the rolling average response time
+REQUEST_WINDOW = 1000
+# Metric snapshots kept in the history
+METRICS_HISTORY_SIZE = 1000
+# Seconds of history covered by the performance summary averages
+SUMMARY_WINDOW_SECONDS = 3600
+# Seconds a connection count is reused; counting scans every socket on the host
+CONNECTION_COUNT_TTL = 30
+# Buffered request records that trigger a fold on the recording thread
+PENDING_FLUSH_SIZE = 1000
+# Seconds a snapshot is recent enough to answer a health check without collecting again
+HEALTH_METRICS_TTL = 30
+
+@dataclass(frozen=True, slots=True)
 class PerformanceMetrics:
     """Performance metrics data structure"""
     timestamp: datetime
@@ -27,33 +43,59 @@ class PerformanceMetrics:
     average_response_time: float
     error_rate: float
 
+# Fields averaged over the summary window
+SUMMARY_FIELDS = ("cpu_percent", "memory_percent", "average_response_time", "requests_per_second", "error_rate")
+
 class PerformanceMonitor:
     """Performance monitoring system"""
     
     def __init__(self):
-        self.metrics_history: List[PerformanceMetrics] = []
-        self.request_times: List[float] = []
+        self.metrics_history = deque(maxlen=METRICS_HISTORY_SIZE)
+        self.request_times = deque(maxlen=REQUEST_WINDOW)
+        self.request_time_sum = 0.0
+        # Snapshots from the last hour and the running sums of the averaged fields
+        self.summary_window = deque()
+        self.summary_sums = {field: 0.0 for field in SUMMARY_FIELDS}
+        # Handlers buffer requests; the lock serializes folding them and updating the summary window
+        self.pending_requests = deque()
+        self.lock = threading.Lock()
+        self.connection_count = 0
+        self.connection_counted_at = None
         self.error_count = 0
         self.request_count = 0
         self.start_time = time.time()
         self.logger = logging.getLogger(__name__)
+        # Prime the CPU sampler so later non-blocking reads measure since the previous call
+        psutil.cpu_percent(interval=None)
         
     def record_request(self, response_time: float, is_error: bool = False):
         """Record a request and its performance"""
-        self.request_count += 1
-        self.request_times.append(response_time)
-        
-        if is_error:
-            self.error_count += 1
-        
-        # Keep only last 1000 request times for rolling average
-        if len(self.request_times) > 1000:
-            self.request_times = self.request_times[-1000:]
+        # deque.append is atomic, so handlers on any thread only pay for the append
+        self.pending_requests.append((response_time, is_error))
+        if len(self.pending_requests) >= PENDING_FLUSH_SIZE:
+            self.flush_requests()
+    
+    def flush_requests(self):
+        """Fold buffered request records into the counters and rolling window"""
+        with self.lock:
+            pending = self.pending_requests
+            while pending:
+                response_time, is_error = pending.popleft()
+                self.request_count += 1
+                
+                # Keep the running sum in step with the rolling window of request times
+                if len(self.request_times) == REQUEST_WINDOW:
+                    self.request_time_sum -= self.request_times[0]
+                self.request_times.append(response_time)
+                self.request_time_sum += response_time
+                
+                if is_error:
+                    self.error_count += 1
     
     def collect_system_metrics(self) -> PerformanceMetrics:
         """Collect current system performance metrics"""
         # CPU and Memory
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = psutil.cpu_percent(interval=None)
         memory = psutil.virtual_memory()
         memory_percent = memory.percent
         memory_used_mb = memory.used / (1024 * 1024)
@@ -69,13 +111,14 @@ class PerformanceMonitor:
         network_recv = network_io.bytes_recv if network_io else 0
         
         # Application metrics
+        self.flush_requests()
         uptime = time.time() - self.start_time
         requests_per_second = self.request_count / uptime if uptime > 0 else 0
-        average_response_time = sum(self.request_times) / len(self.request_times) if self.request_times else 0
+        average_response_time = self.request_time_sum / len(self.request_times) if self.request_times else 0
         error_rate = (self.error_count / self.request_count * 100) if self.request_count > 0 else 0
         
         # Active connections (simplified)
-        active_connections = len(psutil.net_connections())
+        active_connections = self._count_connections()
         
         metrics = PerformanceMetrics(
             timestamp=datetime.now(),
@@ -94,34 +137,52 @@ class PerformanceMonitor:
         
         self.metrics_history.append(metrics)
         
-        # Keep only last 1000 metrics
-        if len(self.metrics_history) > 1000:
-            self.metrics_history = self.metrics_history[-1000:]
+        # The summary only covers snapshots still in the history
+        with self.lock:
+            if len(self.summary_window) == METRICS_HISTORY_SIZE:
+                self._drop_from_summary()
+            self.summary_window.append(metrics)
+            for field in SUMMARY_FIELDS:
+                self.summary_sums[field] += getattr(metrics, field)
         
         return metrics
     
+    def _count_connections(self) -> int:
+        """Return the number of open network connections, recounting at most every CONNECTION_COUNT_TTL seconds"""
+        now = time.monotonic()
+        if self.connection_counted_at is None or now - self.connection_counted_at >= CONNECTION_COUNT_TTL:
+            self.connection_count = len(psutil.net_connections())
+            self.connection_counted_at = now
+        return self.connection_count
+    
+    def _drop_from_summary(self):
+        """Remove the oldest snapshot from the summary window and its sums; the caller holds the lock"""
+        metrics = self.summary_window.popleft()
+        for field in SUMMARY_FIELDS:
+            self.summary_sums[field] -= getattr(metrics, field)
+    
     def get_performance_summary(self) -> Dict[str, Any]:
         """Get performance summary for the last hour"""
+        self.flush_requests()
         now = datetime.now()
-        one_hour_ago = now.timestamp() - 3600
+        one_hour_ago = now.timestamp() - SUMMARY_WINDOW_SECONDS
         
-        recent_metrics = [
-            m for m in self.metrics_history 
-            if m.timestamp.timestamp() > one_hour_ago
-        ]
-        
-        if not recent_metrics:
-            return {"error": "No metrics available"}
-        
-        # Calculate averages
-        avg_cpu = sum(m.cpu_percent for m in recent_metrics) / len(recent_metrics)
-        avg_memory = sum(m.memory_percent for m in recent_metrics) / len(recent_metrics)
-        avg_response_time = sum(m.average_response_time for m in recent_metrics) / len(recent_metrics)
-        avg_rps = sum(m.requests_per_second for m in recent_metrics) / len(recent_metrics)
-        avg_error_rate = sum(m.error_rate for m in recent_metrics) / len(recent_metrics)
-        
-        # Get current values
-        current = recent_metrics[-1]
+        with self.lock:
+            while self.summary_window and self.summary_window[0].timestamp.timestamp() <= one_hour_ago:
+                self._drop_from_summary()
+            
+            recent_metrics = self.summary_window
+            if not recent_metrics:
+                return {"error": "No metrics available"}
+            
+            # Calculate averages from the running sums
+            count = len(recent_metrics)
+            avg_cpu = self.summary_sums["cpu_percent"] / count
+            avg_memory = self.summary_sums["memory_percent"] / count
+            avg_response_time = self.summary_sums["average_response_time"] / count
+            avg_rps = self.summary_sums["requests_per_second"] / count
+            avg_error_rate = self.summary_sums["error_rate"] / count
+            current = recent_metrics[-1]
         
         return {
             "timestamp": now.isoformat(),
@@ -150,7 +211,11 @@ class PerformanceMonitor:
     
     def get_health_status(self) -> Dict[str, Any]:
         """Get system health status"""
-        current = self.collect_system_metrics()
+        # Reuse a recent snapshot so frequent health checks don't each collect metrics
+        if self.metrics_history and time.time() - self.metrics_history[-1].timestamp.timestamp() < HEALTH_METRICS_TTL:
+            current = self.metrics_history[-1]
+        else:
+            current = self.collect_system_metrics()
         
         # Health thresholds
         cpu_threshold = 80.0
@@ -192,30 +257,20 @@ class PerformanceMonitor:
         if not filename:
             filename = f"performance_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
-        export_data = {
-            "export_timestamp": datetime.now().isoformat(),
-            "metrics_count": len(self.metrics_history),
-            "metrics": [
-                {
-                    "timestamp": m.timestamp.isoformat(),
-                    "cpu_percent": m.cpu_percent,
-                    "memory_percent": m.memory_percent,
-                    "memory_used_mb": m.memory_used_mb,
-                    "disk_io_read": m.disk_io_read,
-                    "disk_io_write": m.disk_io_write,
-                    "network_sent": m.network_sent,
-                    "network_recv": m.network_recv,
-                    "active_connections": m.active_connections,
-                    "requests_per_second": m.requests_per_second,
-                    "average_response_time": m.average_response_time,
-                    "error_rate": m.error_rate
-                }
-                for m in self.metrics_history
-            ]
-        }
+        header = orjson.dumps({
+            "export_timestamp": datetime.now(),
+            "metrics_count": len(self.metrics_history)
+        })
         
-        with open(filename, 'w') as f:
-            json.dump(export_data, f, indent=2)
+        # Stream one record per line instead of building the whole export in memory;
+        # orjson serializes the metrics dataclass and its datetime directly
+        with open(filename, 'wb') as f:
+            f.write(header[:-1] + b',"metrics":[\n')
+            for i, m in enumerate(self.metrics_history):
+                if i:
+                    f.write(b',\n')
+                f.write(orjson.dumps(m))
+            f.write(b'\n]}\n')
         
         return filename
 
@@ -224,29 +279,31 @@ performance_monitor = PerformanceMonitor()
 
 def monitor_performance(func):
     """Decorator to monitor function performance"""
+    # Bind the recorder and clock once per decorated function instead of looking them up per call
+    record_request = performance_monitor.record_request
+    clock = time.perf_counter_ns
+    
     async def async_wrapper(*args, **kwargs):
-        start_time = time.time()
+        start = clock()
+        is_error = False
         try:
-            result = await func(*args, **kwargs)
-            response_time = time.time() - start_time
-            performance_monitor.record_request(response_time, False)
-            return result
-        except Exception as e:
-            response_time = time.time() - start_time
-            performance_monitor.record_request(response_time, True)
-            raise e
+            return await func(*args, **kwargs)
+        except Exception:
+            is_error = True
+            raise
+        finally:
+            record_request((clock() - start) * 1e-9, is_error)
     
     def sync_wrapper(*args, **kwargs):
-        start_time = time.time()
+        start = clock()
+        is_error = False
         try:
-            result = func(*args, **kwargs)
-            response_time = time.time() - start_time
-            performance_monitor.record_request(response_time, False)
-            return result
-        except Exception as e:
-            response_time = time.time() - start_time
-            performance_monitor.record_request(response_time, True)
-            raise e
+            return func(*args, **kwargs)
+        except Exception:
+            is_error = True
+            raise
+        finally:
+            record_request((clock() - start) * 1e-9, is_error)
     
     if asyncio.iscoroutinefunction(func):
         return async_wrapper
@@ -257,7 +314,8 @@ async def start_performance_monitoring():
     """Start background performance monitoring"""
     while True:
         try:
-            performance_monitor.collect_system_metrics()
+            # psutil reads are blocking system calls, so keep them off the event loop
+            await asyncio.to_thread(performance_monitor.collect_system_metrics)
             await asyncio.sleep(60)  # Collect metrics every minute
         except Exception as e:
             print(f"Error in performance monitoring: {e}")
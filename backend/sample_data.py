@@ -2,15 +2,21 @@
 Sample AS/400 data files for demonstration purposes
 """
 
+from pathlib import Path
+from types import MappingProxyType
+
+# Sample files live next to this module no matter where the caller runs from
+SAMPLE_FILES_DIR = Path(__file__).parent / "sample_files"
+
 # Sample AS/400 Flat File (Fixed Width)
-SAMPLE_FLAT_FILE = """CUST001JOHN DOE    123 MAIN ST    NEW YORK    NY10001 555-0123
+SAMPLE_FLAT_FILE = b"""CUST001JOHN DOE    123 MAIN ST    NEW YORK    NY10001 555-0123
 CUST002JANE SMITH  456 OAK AVE   CHICAGO     IL60601 555-0456
 CUST003BOB JOHNSON 789 PINE RD   LOS ANGELES CA90210 555-0789
 CUST004ALICE BROWN 321 ELM ST    HOUSTON     TX77001 555-0321
 CUST005CHARLIE WILSON 654 MAPLE DR MIAMI     FL33101 555-0654"""
 
 # Sample AS/400 Flat File (Delimited)
-SAMPLE_DELIMITED_FILE = """CUST_ID|CUST_NAME|ADDRESS|CITY|STATE|ZIP|PHONE
+SAMPLE_DELIMITED_FILE = b"""CUST_ID|CUST_NAME|ADDRESS|CITY|STATE|ZIP|PHONE
 CUST001|JOHN DOE|123 MAIN ST|NEW YORK|NY|10001|555-0123
 CUST002|JANE SMITH|456 OAK AVE|CHICAGO|IL|60601|555-0456
 CUST003|BOB JOHNSON|789 PINE RD|LOS ANGELES|CA|90210|555-0789
@@ -18,7 +24,7 @@ CUST004|ALICE BROWN|321 ELM ST|HOUSTON|TX|77001|555-0321
 CUST005|CHARLIE WILSON|654 MAPLE DR|MIAMI|FL|33101|555-0654"""
 
 # Sample DB2 Table Definition (DDS)
-SAMPLE_DDS_FILE = """A                                      UNIQUE
+SAMPLE_DDS_FILE = b"""A                                      UNIQUE
 A          R CUSTOMER
 A            CUSTID         10A        TEXT('Customer ID')
 A            CUSTNAME       30A        TEXT('Customer Name')
@@ -32,7 +38,7 @@ A            STATUS          1A        TEXT('Status')
 A          K CUSTID"""
 
 # Sample DB2 Table Definition (SQL)
-SAMPLE_SQL_FILE = """CREATE TABLE CUSTOMER (
+SAMPLE_SQL_FILE = b"""CREATE TABLE CUSTOMER (
     CUSTID CHAR(10) NOT NULL,
     CUSTNAME VARCHAR(30) NOT NULL,
     ADDRESS VARCHAR(50),
@@ -46,7 +52,7 @@ SAMPLE_SQL_FILE = """CREATE TABLE CUSTOMER (
 );"""
 
 # Sample Green Screen Interface
-SAMPLE_GREEN_SCREEN = """Customer Information System
+SAMPLE_GREEN_SCREEN = b"""Customer Information System
 =====================================
 
 Customer ID: [CUST001    ]
@@ -64,7 +70,7 @@ Function: [DSP]  (DSP=Display, UPD=Update, ADD=Add, DEL=Delete)
 """
 
 # Sample RPG Program
-SAMPLE_RPG_PROGRAM = """     H DEBUG(*YES)
+SAMPLE_RPG_PROGRAM = b"""     H DEBUG(*YES)
      F* Customer Master File
      FCUSTOMER  IF   E           K DISK
      F* Display File
@@ -106,14 +112,14 @@ SAMPLE_RPG_PROGRAM = """     H DEBUG(*YES)
      C                   ENDSR"""
 
 # Sample Order Data (Fixed Width)
-SAMPLE_ORDER_FILE = """ORD001CUST001202401011000.50A
+SAMPLE_ORDER_FILE = b"""ORD001CUST001202401011000.50A
 ORD002CUST002202401021500.75A
 ORD003CUST001202401031200.25A
 ORD004CUST003202401042000.00A
 ORD005CUST002202401051750.30A"""
 
 # Sample Product Data (Delimited)
-SAMPLE_PRODUCT_FILE = """PROD_ID|PROD_NAME|CATEGORY|PRICE|STOCK_QTY|STATUS
+SAMPLE_PRODUCT_FILE = b"""PROD_ID|PROD_NAME|CATEGORY|PRICE|STOCK_QTY|STATUS
 PROD001|Widget A|Electronics|29.99|100|A
 PROD002|Widget B|Electronics|39.99|50|A
 PROD003|Gadget X|Tools|19.99|200|A
@@ -121,7 +127,7 @@ PROD004|Gadget Y|Tools|24.99|75|A
 PROD005|Thing Z|Accessories|9.99|300|A"""
 
 # Sample Employee Data (DDS)
-SAMPLE_EMPLOYEE_DDS = """A                                      UNIQUE
+SAMPLE_EMPLOYEE_DDS = b"""A                                      UNIQUE
 A          R EMPLOYEE
 A            EMPID           6A         TEXT('Employee ID')
 A            EMPNAME         25A        TEXT('Employee Name')
@@ -133,52 +139,51 @@ A            STATUS          1A         TEXT('Status')
 A          K EMPID"""
 
 # Sample Inventory Data (Fixed Width)
-SAMPLE_INVENTORY_FILE = """ITEM001WIDGET A     ELECTRONICS 29.99 100 A
+SAMPLE_INVENTORY_FILE = b"""ITEM001WIDGET A     ELECTRONICS 29.99 100 A
 ITEM002WIDGET B     ELECTRONICS 39.99  50 A
 ITEM003GADGET X     TOOLS       19.99 200 A
 ITEM004GADGET Y     TOOLS       24.99  75 A
 ITEM005THING Z      ACCESSORIES  9.99 300 A"""
 
 # Sample Financial Data (Delimited)
-SAMPLE_FINANCIAL_FILE = """ACCT_ID|ACCT_NAME|ACCT_TYPE|BALANCE|STATUS|OPEN_DATE
+SAMPLE_FINANCIAL_FILE = b"""ACCT_ID|ACCT_NAME|ACCT_TYPE|BALANCE|STATUS|OPEN_DATE
 100001|Cash Account|Asset|50000.00|A|20240101
 100002|Accounts Receivable|Asset|25000.00|A|20240101
 200001|Accounts Payable|Liability|15000.00|A|20240101
 300001|Retained Earnings|Equity|60000.00|A|20240101
 400001|Sales Revenue|Revenue|100000.00|A|20240101"""
 
+# Read-only view of all sample files, shared by every get_sample_data() call
+SAMPLE_DATA = MappingProxyType({
+    "flat_file_fixed": SAMPLE_FLAT_FILE,
+    "flat_file_delimited": SAMPLE_DELIMITED_FILE,
+    "dds_file": SAMPLE_DDS_FILE,
+    "sql_file": SAMPLE_SQL_FILE,
+    "green_screen": SAMPLE_GREEN_SCREEN,
+    "rpg_program": SAMPLE_RPG_PROGRAM,
+    "order_file": SAMPLE_ORDER_FILE,
+    "product_file": SAMPLE_PRODUCT_FILE,
+    "employee_dds": SAMPLE_EMPLOYEE_DDS,
+    "inventory_file": SAMPLE_INVENTORY_FILE,
+    "financial_file": SAMPLE_FINANCIAL_FILE
+})
+
 def get_sample_data():
-    """Return all sample data files"""
-    return {
-        "flat_file_fixed": SAMPLE_FLAT_FILE,
-        "flat_file_delimited": SAMPLE_DELIMITED_FILE,
-        "dds_file": SAMPLE_DDS_FILE,
-        "sql_file": SAMPLE_SQL_FILE,
-        "green_screen": SAMPLE_GREEN_SCREEN,
-        "rpg_program": SAMPLE_RPG_PROGRAM,
-        "order_file": SAMPLE_ORDER_FILE,
-        "product_file": SAMPLE_PRODUCT_FILE,
-        "employee_dds": SAMPLE_EMPLOYEE_DDS,
-        "inventory_file": SAMPLE_INVENTORY_FILE,
-        "financial_file": SAMPLE_FINANCIAL_FILE
-    }
-
-def create_sample_files():
-    """Create sample files in the backend directory"""
-    import os
-    
-    sample_dir = "sample_files"
-    if not os.path.exists(sample_dir):
-        os.makedirs(sample_dir)
+    """Return all sample data files as bytes"""
+    return SAMPLE_DATA
+
+def create_sample_files(output_dir: Path = SAMPLE_FILES_DIR):
+    """Create sample files in output_dir, the backend's sample_files directory by default"""
+    output_dir.mkdir(parents=True, exist_ok=True)
     
     samples = get_sample_data()
     
     for filename, content in samples.items():
-        filepath = os.path.join(sample_dir, f"{filename}.txt")
-        with open(filepath, 'w') as f:
+        # Each file is a single write, so skip the buffered writer
+        with open(output_dir / f"{filename}.txt", 'wb', buffering=0) as f:
             f.write(content)
     
-    print(f"Created {len(samples)} sample files in {sample_dir}/")
+    print(f"Created {len(samples)} sample files in {output_dir}/")
 
 if __name__ == "__main__":
     create_sample_files()
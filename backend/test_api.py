@@ -6,10 +6,79 @@ import pytest
 import asyncio
 from fastapi.testclient import TestClient
 from main import app
-from models import DataSourceType
+from models import DataSourceType, FieldMapping
+import ai_transformer
+from ai_transformer import AITransformationEngine, CACHE_TTL_SECONDS, FIELD_MAPPING_DEFAULTS
+from legacy_ingestion import AS400IngestionEngine, FILE_BLOCK_SIZE
 
 client = TestClient(app)
 
+FLAT_FILE_CONTENT = """CUST001JOHN DOE    123 MAIN ST    NEW YORK    NY10001 555-0123
+CUST002JANE SMITH  456 OAK AVE   CHICAGO     IL60601 555-0456"""
+
+def upload_flat_file():
+    """Upload the sample flat file and return the response"""
+    files = {"file": ("test_customers.txt", FLAT_FILE_CONTENT, "text/plain")}
+    return client.post("/upload", files=files)
+
+@pytest.fixture(scope="session")
+def uploaded_legacy_id():
+    """Upload the sample flat file once and share its legacy id"""
+    response = upload_flat_file()
+    assert response.status_code == 200
+    return response.json()["legacy_id"]
+
+@pytest.fixture(scope="class")
+def modernized_id(uploaded_legacy_id):
+    """Transform the uploaded flat file once and share its modernized id"""
+    response = client.post(f"/transform/{uploaded_legacy_id}")
+    assert response.status_code == 200
+    return response.json()["modernized_id"]
+
+@pytest.fixture(scope="session")
+def large_payload():
+    """Build the 1000-row flat file once, already encoded"""
+    return "\n".join([
+        f"CUST{i:03d}CUSTOMER{i:03d} 123 MAIN ST    CITY{i:03d}    ST{i:02d}12345 555-{i:04d}"
+        for i in range(1000)
+    ]).encode()
+
+# Line layouts the vectorized scanners must measure exactly like the per-line loops
+LINE_LENGTH_CASES = [
+    "",
+    "\n\n",
+    FLAT_FILE_CONTENT,
+    "A|B|C\n1|2|3\n",
+    "A|B\r\n1|2\r\n\r\n",
+    "ID  NAME\n\n   \n1   JOSÉ\n2   ÅSA",
+    "A B\n\t\x0b\x0c\x1c\x1f\nC D",
+    "名前  住所\n東京  大阪\n\u3000\n",
+    "last line without newline"
+]
+
+def reference_line_lengths(text):
+    """Non-blank line lengths as the original per-line loop computed them"""
+    return [len(line) for line in text.split('\n') if line.strip()]
+
+def reference_field_positions(line):
+    """Field positions as the original character loop computed them"""
+    field_positions = {}
+    current_pos = 0
+    field_num = 1
+    while current_pos < len(line):
+        start = current_pos
+        while start < len(line) and line[start].isspace():
+            start += 1
+        if start >= len(line):
+            break
+        end = start
+        while end < len(line) and not line[end].isspace():
+            end += 1
+        field_positions[f"FIELD_{field_num}"] = (start, end)
+        current_pos = end
+        field_num += 1
+    return field_positions
+
 class TestLegacyModernizationAPI:
     """Test suite for the legacy modernization API"""
     
@@ -24,22 +93,13 @@ class TestLegacyModernizationAPI:
     
     def test_upload_flat_file(self):
         """Test uploading a flat file"""
-        # Create a test flat file content
-        test_content = """CUST001JOHN DOE    123 MAIN ST    NEW YORK    NY10001 555-0123
-CUST002JANE SMITH  456 OAK AVE   CHICAGO     IL60601 555-0456"""
-        
-        # Create a test file
-        files = {"file": ("test_customers.txt", test_content, "text/plain")}
-        
-        response = client.post("/upload", files=files)
+        response = upload_flat_file()
         assert response.status_code == 200
         
         data = response.json()
         assert data["success"] == True
         assert "legacy_id" in data
         assert data["source_type"] == "flat_file"
-        
-        return data["legacy_id"]
     
     def test_upload_delimited_file(self):
         """Test uploading a delimited file"""
@@ -58,6 +118,116 @@ CUST002|JANE SMITH|456 OAK AVE|CHICAGO|IL|60601|555-0456"""
         
         return data["legacy_id"]
     
+    def test_upload_delimited_duplicate_headers_and_short_rows(self):
+        """Test delimited rows keep the raw headers and leave out missing fields"""
+        test_content = """ID,NAME,NAME,ADDRESS_LINE
+1,JOHN,DOE,123 MAIN ST
+2,JANE"""
+        
+        files = {"file": ("test_duplicates.txt", test_content, "text/plain")}
+        
+        response = client.post("/upload", files=files)
+        assert response.status_code == 200
+        
+        response = client.get(f"/legacy/{response.json()['legacy_id']}")
+        assert response.status_code == 200
+        
+        metadata = response.json()["metadata"]
+        assert metadata["headers"] == ["ID", "NAME", "NAME", "ADDRESS_LINE"]
+        assert metadata["sample_data"] == [
+            {"ID": "1", "NAME": "DOE", "ADDRESS_LINE": "123 MAIN ST"},
+            {"ID": "2", "NAME": "JANE"}
+        ]
+    
+    def test_response_builder_fills_defaults_and_ignores_extra_keys(self):
+        """Test generated builders read present keys, default missing ones and skip extras"""
+        engine = AITransformationEngine()
+        item = {"legacy_field": "CUSTID", "modern_field": "customer_id", "extra": "ignored"}
+        
+        builder = engine._get_builder(FieldMapping, FIELD_MAPPING_DEFAULTS, item)
+        assert builder(item) == FieldMapping(
+            legacy_field="CUSTID",
+            modern_field="customer_id",
+            data_type="VARCHAR",
+            description="",
+            transformation_rule=None
+        )
+        # One builder per key shape, shared across items
+        assert engine._get_builder(FieldMapping, FIELD_MAPPING_DEFAULTS, dict(item, extra=1)) is builder
+        assert engine._get_builder(FieldMapping, FIELD_MAPPING_DEFAULTS, {}) is not builder
+        assert engine._get_builder(FieldMapping, FIELD_MAPPING_DEFAULTS, {})({}) == FieldMapping(
+            legacy_field="", modern_field="", data_type="VARCHAR", description=""
+        )
+    
+    def test_transformation_cache_hit_and_ttl(self):
+        """Test cached stage results are returned until they outlive the TTL"""
+        engine = AITransformationEngine()
+        engine._store_cached("analysis", "key", {"complexity": "low"})
+        assert engine._get_cached("analysis", "key") == {"complexity": "low"}
+        assert engine._get_cached("analysis", "other") is None
+        
+        stored_at, value = engine.transformation_cache["analysis"]["key"]
+        engine.transformation_cache["analysis"]["key"] = (stored_at - CACHE_TTL_SECONDS - 1, value)
+        assert engine._get_cached("analysis", "key") is None
+        assert "key" not in engine.transformation_cache["analysis"]
+    
+    def test_transformation_cache_evicts_least_recently_used(self, monkeypatch):
+        """Test a full cache evicts the entry that was used least recently"""
+        monkeypatch.setattr(ai_transformer, "CACHE_MAX_ENTRIES", 2)
+        engine = AITransformationEngine()
+        engine._store_cached("schema", "a", 1)
+        engine._store_cached("schema", "b", 2)
+        assert engine._get_cached("schema", "a") == 1
+        
+        engine._store_cached("schema", "c", 3)
+        assert list(engine.transformation_cache["schema"]) == ["a", "c"]
+    
+    def test_fallback_results_are_not_cached(self):
+        """Test only parsed AI answers are cached, never the local fallbacks"""
+        engine = AITransformationEngine(api_key="test-key")
+        legacy_data = AS400IngestionEngine().parse_flat_file(FLAT_FILE_CONTENT, "customers.txt")
+        
+        async def complete(stage, **kwargs):
+            return '{"complexity": "low"}' if stage == "analysis" else "not json"
+        
+        async def transform():
+            try:
+                return await engine.transform_legacy_data(legacy_data)
+            finally:
+                await engine.aclose()
+        
+        engine._complete = complete
+        modernized = asyncio.run(transform())
+        
+        assert modernized.api_specs and modernized.microservices
+        assert {stage: len(cache) for stage, cache in engine.transformation_cache.items()} == {
+            "analysis": 1,
+            "schema": 0,
+            "apis": 0,
+            "microservices": 0
+        }
+    
+    def test_flat_file_parses_the_same_from_disk(self, tmp_path):
+        """Test spooled uploads parse exactly like in-memory ones"""
+        engine = AS400IngestionEngine()
+        payloads = [
+            FLAT_FILE_CONTENT,
+            "  " + FLAT_FILE_CONTENT + "  \n\n",
+            "  A|B|C\n1|2|3\n",
+            "A|B|C\n1|2|3   \n",
+            "\n  \nID,NAME,NAME\n1,a\n\n 2,b,c,d \n  \n",
+            "A|B\r\n1|2\r\n"
+        ]
+        
+        for payload in payloads:
+            path = tmp_path / "upload.txt"
+            path.write_text(payload, encoding="utf-8", newline="")
+            
+            in_memory = engine.parse_flat_file(payload, "upload.txt")
+            on_disk = engine.parse_flat_file_path(str(path), "upload.txt")
+            assert on_disk.metadata == in_memory.metadata
+            assert on_disk.content == in_memory.content
+    
     def test_upload_sql_file(self):
         """Test uploading a SQL file"""
         test_content = """CREATE TABLE CUSTOMER (
@@ -99,13 +269,9 @@ CUST002|JANE SMITH|456 OAK AVE|CHICAGO|IL|60601|555-0456"""
         
         return data["legacy_id"]
     
-    def test_transform_legacy_data(self):
+    def test_transform_legacy_data(self, uploaded_legacy_id):
         """Test transforming legacy data"""
-        # First upload a file
-        legacy_id = self.test_upload_flat_file()
-        
-        # Then transform it
-        response = client.post(f"/transform/{legacy_id}")
+        response = client.post(f"/transform/{uploaded_legacy_id}")
         assert response.status_code == 200
         
         data = response.json()
@@ -113,25 +279,74 @@ CUST002|JANE SMITH|456 OAK AVE|CHICAGO|IL|60601|555-0456"""
         assert "modernized_id" in data
         assert "api_count" in data
         assert "microservices_count" in data
+    
+    def test_transform_legacy_data_batch(self):
+        """Test transforming several legacy items in one request"""
+        legacy_ids = [upload_flat_file().json()["legacy_id"] for _ in range(2)]
         
-        return data["modernized_id"]
+        response = client.post("/transform", json={"legacy_ids": legacy_ids})
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["success"] == True
+        assert [result["legacy_id"] for result in data["results"]] == legacy_ids
+        for result in data["results"]:
+            assert client.get(f"/modernized/{result['modernized_id']}").status_code == 200
+    
+    def test_transform_legacy_data_batch_unknown_id(self, uploaded_legacy_id):
+        """Test batch transformation rejects unknown legacy ids with a 404"""
+        response = client.post("/transform", json={"legacy_ids": [uploaded_legacy_id, "invalid-id"]})
+        assert response.status_code == 404
+        assert "invalid-id" in response.json()["detail"]
     
-    def test_get_legacy_data(self):
+    def test_transform_batch_groups_items(self):
+        """Test batch transformation issues one analysis per batch and keeps item order"""
+        engine = AITransformationEngine()
+        items = [
+            AS400IngestionEngine().parse_flat_file(FLAT_FILE_CONTENT, f"customers_{i}.txt")
+            for i in range(5)
+        ]
+        batch_sizes = []
+        analyze_batch = engine._analyze_legacy_structure_batch
+        
+        async def record_batch(batch):
+            batch_sizes.append(len(batch))
+            return await analyze_batch(batch)
+        
+        engine._analyze_legacy_structure_batch = record_batch
+        results = asyncio.run(engine.transform_legacy_data_batch(items, batch_size=2))
+        
+        assert batch_sizes == [2, 2, 1]
+        assert [result.legacy_id for result in results] == [item.id for item in items]
+    
+    def test_parse_batch_analysis_response(self):
+        """Test batched analyses are mapped back to their legacy ids"""
+        engine = AITransformationEngine()
+        response = """[
+            {"id": "a", "analysis": {"complexity": "low"}},
+            {"id": "b", "analysis": "not an object"},
+            {"analysis": {"complexity": "high"}},
+            {"id": "c", "analysis": {"complexity": "high"}}
+        ]"""
+        
+        assert engine._parse_batch_analysis_response(response) == {
+            "a": {"complexity": "low"},
+            "c": {"complexity": "high"}
+        }
+        assert engine._parse_batch_analysis_response("not json") == {}
+    
+    def test_get_legacy_data(self, uploaded_legacy_id):
         """Test getting legacy data details"""
-        legacy_id = self.test_upload_flat_file()
-        
-        response = client.get(f"/legacy/{legacy_id}")
+        response = client.get(f"/legacy/{uploaded_legacy_id}")
         assert response.status_code == 200
         
         data = response.json()
-        assert data["id"] == legacy_id
+        assert data["id"] == uploaded_legacy_id
         assert "source_type" in data
         assert "metadata" in data
     
-    def test_get_modernized_data(self):
+    def test_get_modernized_data(self, modernized_id):
         """Test getting modernized data details"""
-        modernized_id = self.test_transform_legacy_data()
-        
         response = client.get(f"/modernized/{modernized_id}")
         assert response.status_code == 200
         
@@ -141,10 +356,8 @@ CUST002|JANE SMITH|456 OAK AVE|CHICAGO|IL|60601|555-0456"""
         assert "api_specs" in data
         assert "microservices" in data
     
-    def test_query_modernized_data(self):
+    def test_query_modernized_data(self, modernized_id):
         """Test querying modernized data"""
-        modernized_id = self.test_transform_legacy_data()
-        
         response = client.post(f"/query/{modernized_id}", json={
             "table_name": "customers",
             "limit": 5
@@ -157,10 +370,8 @@ CUST002|JANE SMITH|456 OAK AVE|CHICAGO|IL|60601|555-0456"""
         assert "total_count" in data
         assert "query_time" in data
     
-    def test_get_microservices(self):
+    def test_get_microservices(self, modernized_id):
         """Test getting microservices architecture"""
-        modernized_id = self.test_transform_legacy_data()
-        
         response = client.get(f"/microservices/{modernized_id}")
         assert response.status_code == 200
         
@@ -168,10 +379,8 @@ CUST002|JANE SMITH|456 OAK AVE|CHICAGO|IL|60601|555-0456"""
         assert "microservices" in data
         assert "architecture_diagram" in data
     
-    def test_get_api_specs(self):
+    def test_get_api_specs(self, modernized_id):
         """Test getting API specifications"""
-        modernized_id = self.test_transform_legacy_data()
-        
         response = client.get(f"/api-specs/{modernized_id}")
         assert response.status_code == 200
         
@@ -233,21 +442,44 @@ CUST002|JANE SMITH|456 OAK AVE|CHICAGO|IL|60601|555-0456"""
         data = response.json()
         assert data["source_type"] == "rpg_program"
     
-    def test_large_file_handling(self):
+    def test_large_file_handling(self, large_payload):
         """Test handling of large files"""
-        # Create a large test file
-        large_content = "\n".join([
-            f"CUST{i:03d}CUSTOMER{i:03d} 123 MAIN ST    CITY{i:03d}    ST{i:02d}12345 555-{i:04d}"
-            for i in range(1000)
-        ])
-        
-        files = {"file": ("large_file.txt", large_content, "text/plain")}
+        files = {"file": ("large_file.txt", large_payload, "text/plain")}
         response = client.post("/upload", files=files)
         assert response.status_code == 200
         
         data = response.json()
         assert data["success"] == True
         assert data["metadata"]["row_count"] == 1000
+    
+    def test_line_lengths_match_per_line_loop(self):
+        """Test the vectorized line lengths match the per-line loop"""
+        engine = AS400IngestionEngine()
+        for text in LINE_LENGTH_CASES:
+            assert engine._line_lengths(text).tolist() == reference_line_lengths(text)
+    
+    def test_field_positions_match_character_loop(self):
+        """Test the vectorized field positions match the character loop"""
+        engine = AS400IngestionEngine()
+        for text in LINE_LENGTH_CASES:
+            for line in text.split('\n'):
+                assert engine._detect_field_positions([line]) == reference_field_positions(line)
+        assert engine._detect_field_positions([]) == {}
+    
+    def test_file_line_lengths_across_blocks(self, tmp_path):
+        """Test line lengths read in blocks match the stripped text, across block boundaries"""
+        engine = AS400IngestionEngine()
+        lines = [f"  ROW{i:06d}  JOSÉ  {'x' * (i % 13)}\r" if i % 7 else "  " for i in range(60000)]
+        payloads = LINE_LENGTH_CASES + [
+            "\n".join(lines) + "  \n\n",
+            "A" * (FILE_BLOCK_SIZE + 10) + "\n" + "B" * 5
+        ]
+        assert len(payloads[-2]) > FILE_BLOCK_SIZE
+        
+        for payload in payloads:
+            path = tmp_path / "upload.txt"
+            path.write_text(payload, encoding="utf-8", newline="")
+            assert engine._file_line_lengths(str(path)).tolist() == reference_line_lengths(payload.strip())
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
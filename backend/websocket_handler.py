@@ -2,28 +2,54 @@
 WebSocket handler for real-time updates
 """
 
-import json
 import asyncio
-from typing import Dict, List
+import orjson
+from typing import Dict, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime
 
+# Seconds to wait after an event so closely spaced updates go out as one batch
+COALESCE_WINDOW = 0.05
+# Most sends in flight at once during a broadcast
+BROADCAST_BATCH_SIZE = 256
+
 class ConnectionManager:
     """Manages WebSocket connections for real-time updates"""
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.drain_task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the background task that broadcasts queued updates"""
+        if self.drain_task is None:
+            self.drain_task = asyncio.create_task(self._drain())
+    
+    async def stop(self):
+        """Stop the background broadcaster"""
+        if self.drain_task is not None:
+            self.drain_task.cancel()
+            try:
+                await self.drain_task
+            except asyncio.CancelledError:
+                pass
+            self.drain_task = None
+    
+    @property
+    def has_listeners(self) -> bool:
+        """Whether any client is connected to receive broadcasts"""
+        return bool(self.active_connections)
     
     async def connect(self, websocket: WebSocket):
         """Accept a new WebSocket connection"""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
         print(f"WebSocket connected. Total connections: {len(self.active_connections)}")
     
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
         print(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
     
     async def send_personal_message(self, message: str, websocket: WebSocket):
@@ -39,13 +65,21 @@ class ConnectionManager:
         if not self.active_connections:
             return
         
+        # Send to clients concurrently so one slow socket doesn't delay the rest,
+        # in batches so a large audience doesn't schedule every send at once
+        connections = list(self.active_connections)
         disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                print(f"Error broadcasting to connection: {e}")
-                disconnected.append(connection)
+        for start in range(0, len(connections), BROADCAST_BATCH_SIZE):
+            batch = connections[start:start + BROADCAST_BATCH_SIZE]
+            results = await asyncio.gather(
+                *[connection.send_text(message) for connection in batch],
+                return_exceptions=True
+            )
+            
+            for connection, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    print(f"Error broadcasting to connection: {result}")
+                    disconnected.append(connection)
         
         # Remove disconnected connections
         for connection in disconnected:
@@ -53,45 +87,91 @@ class ConnectionManager:
     
     async def send_processing_update(self, legacy_id: str, status: str, progress: int = 0):
         """Send processing status update"""
+        if not self.has_listeners:
+            return
+        
         message = {
             "type": "processing_update",
             "legacy_id": legacy_id,
             "status": status,
             "progress": progress,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now()
         }
-        await self.broadcast(json.dumps(message))
+        await self._publish(message)
     
     async def send_transformation_complete(self, legacy_id: str, modernized_id: str, api_count: int, microservices_count: int):
         """Send transformation completion notification"""
+        if not self.has_listeners:
+            return
+        
         message = {
             "type": "transformation_complete",
             "legacy_id": legacy_id,
             "modernized_id": modernized_id,
             "api_count": api_count,
             "microservices_count": microservices_count,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now()
         }
-        await self.broadcast(json.dumps(message))
+        await self._publish(message)
     
     async def send_dashboard_update(self, dashboard_data: Dict):
         """Send dashboard data update"""
+        if not self.has_listeners:
+            return
+        
         message = {
             "type": "dashboard_update",
             "data": dashboard_data,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now()
         }
-        await self.broadcast(json.dumps(message))
+        await self._publish(message)
     
     async def send_error(self, error_message: str, legacy_id: str = None):
         """Send error notification"""
+        if not self.has_listeners:
+            return
+        
         message = {
             "type": "error",
             "message": error_message,
             "legacy_id": legacy_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now()
         }
-        await self.broadcast(json.dumps(message))
+        await self._publish(message)
+
+    def _encode(self, message: Dict) -> str:
+        """Serialize a message once for all clients"""
+        return orjson.dumps(message).decode()
+    
+    async def _publish(self, message: Dict):
+        """Queue a message for the broadcaster, or send it now if the broadcaster isn't running"""
+        if self.drain_task is not None:
+            self.queue.put_nowait(message)
+        else:
+            await self.broadcast(self._encode(message))
+    
+    async def _drain(self):
+        """Broadcast queued messages, collapsing each batch's dashboard updates into the latest one"""
+        while True:
+            batch = [await self.queue.get()]
+            await asyncio.sleep(COALESCE_WINDOW)
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            
+            if not self.active_connections:
+                continue
+            
+            last_dashboard = max(
+                (i for i, message in enumerate(batch) if message["type"] == "dashboard_update"),
+                default=None
+            )
+            for i, message in enumerate(batch):
+                if message["type"] == "dashboard_update" and i != last_dashboard:
+                    continue
+                try:
+                    await self.broadcast(self._encode(message))
+                except Exception as e:
+                    print(f"Error broadcasting update: {e}")
 
 # Global connection manager instance
 manager = ConnectionManager()
@@ -0,0 +1,72 @@
+"""
+AS/400 Legacy Modernization Assistant - Shared launcher helpers
+"""
+
+import functools
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Project layout, resolved once so it does not depend on the caller's cwd
+PROJECT_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = PROJECT_DIR / "backend"
+FRONTEND_DIR = PROJECT_DIR / "my-legacy-modernizer"
+
+# Server output goes to log files so a full pipe can never stall the children
+BACKEND_LOG = PROJECT_DIR / "backend.log"
+FRONTEND_LOG = PROJECT_DIR / "frontend.log"
+
+@functools.cache
+def resolve_python(backend_dir):
+    """Return the backend venv's interpreter if there is one, else the current one"""
+    for venv_python in (backend_dir / "venv" / "Scripts" / "python.exe",
+                        backend_dir / "venv" / "bin" / "python"):
+        if venv_python.exists():
+            return str(venv_python)
+    return sys.executable
+
+def poll_until(probe, deadline, delay=0.025, cap=0.5):
+    """Call probe with doubling sleeps until it returns True or the monotonic deadline passes"""
+    while not probe():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, cap)
+    return True
+
+def port_open(port):
+    """Return True if something accepts connections on the local port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.05)
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+def stop_process(process, timeout=5):
+    """Terminate a child and reap it, killing it if it does not exit within timeout seconds"""
+    process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def wait_for_signal():
+    """Block with no periodic wakeups until a signal handler raises, e.g. KeyboardInterrupt on Ctrl+C"""
+    # A socket pair works as a wakeup fd on Windows too, unlike a pipe
+    reader, writer = socket.socketpair()
+    writer.setblocking(False)
+    previous = signal.set_wakeup_fd(writer.fileno())
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(reader, selectors.EVENT_READ)
+            while True:
+                selector.select()
+                reader.recv(64)
+    finally:
+        signal.set_wakeup_fd(previous)
+        reader.close()
+        writer.close()
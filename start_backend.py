@@ -3,44 +3,65 @@
 AS/400 Legacy Modernization Assistant - Backend Startup Script
 """
 
+import hashlib
+import importlib.util
 import os
 import sys
 import subprocess
 import time
-from pathlib import Path
+from launcher import BACKEND_DIR, resolve_python
+
+# Records the interpreter and requirements.txt hash that last passed the dependency check
+DEPS_STAMP = ".deps_ok"
+
+def have_fastapi(python_cmd):
+    """Check whether FastAPI imports under python_cmd, in-process when it is our own interpreter"""
+    if python_cmd == sys.executable:
+        return importlib.util.find_spec("fastapi") is not None
+    result = subprocess.run([python_cmd, "-c", "import fastapi; print('FastAPI available')"], 
+                          capture_output=True, text=True, timeout=10)
+    return result.returncode == 0
+
+def dependencies_ok(python_cmd, backend_dir):
+    """Check FastAPI, skipping the probe while the interpreter and requirements.txt are unchanged"""
+    requirements = backend_dir / "requirements.txt"
+    digest = hashlib.blake2b(requirements.read_bytes() if requirements.exists() else b"").hexdigest()
+    stamp = f"{python_cmd}\n{digest}"
+    
+    stamp_file = backend_dir / DEPS_STAMP
+    if stamp_file.exists() and stamp_file.read_text(errors="ignore") == stamp:
+        return True
+    
+    if not have_fastapi(python_cmd):
+        return False
+    stamp_file.write_text(stamp)
+    return True
 
 def main():
     """Start the backend server"""
     print("🚀 Starting AS/400 Legacy Modernization Assistant Backend...")
     print("=" * 60)
     
-    # Get the backend directory
-    backend_dir = Path(__file__).parent / "backend"
-    
-    if not backend_dir.exists():
+    if not BACKEND_DIR.exists():
         print("❌ Backend directory not found!")
         return False
     
     # Change to backend directory
     original_dir = os.getcwd()
-    os.chdir(backend_dir)
+    os.chdir(BACKEND_DIR)
     
     try:
         # Use virtual environment python
-        venv_python = backend_dir / "venv" / "Scripts" / "python.exe"
+        python_cmd = resolve_python(BACKEND_DIR)
         
-        if venv_python.exists():
-            python_cmd = str(venv_python)
+        if python_cmd != sys.executable:
             print(f"✅ Using virtual environment: {python_cmd}")
         else:
-            python_cmd = sys.executable
             print(f"⚠️ Using system Python: {python_cmd}")
         
         # Check if FastAPI is installed
         try:
-            result = subprocess.run([python_cmd, "-c", "import fastapi; print('FastAPI available')"], 
-                                  capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
+            if dependencies_ok(python_cmd, BACKEND_DIR):
                 print("✅ FastAPI is available")
             else:
                 print("❌ FastAPI not found, installing...")
@@ -58,13 +79,21 @@ def main():
         print("=" * 60)
         
         # Use uvicorn to start the server
-        subprocess.run([
+        command = [
             python_cmd, "-m", "uvicorn", 
             "main:app", 
             "--host", "0.0.0.0", 
             "--port", "8000", 
             "--reload"
-        ])
+        ]
+        
+        if os.name == "posix":
+            # Become uvicorn instead of idling next to it; Ctrl+C then reaches the server directly
+            sys.stdout.flush()
+            os.execv(python_cmd, command)
+        
+        # Windows has no real exec, so wait on a child there
+        subprocess.run(command)
         
     except KeyboardInterrupt:
         print("\n✅ Backend server stopped")
@@ -4,30 +4,34 @@ Simple frontend startup script for AS/400 Legacy Modernization Assistant
 """
 
 import os
+import shutil
 import sys
 import subprocess
-from pathlib import Path
+from launcher import FRONTEND_DIR
 
 def main():
     """Start the frontend server"""
     print("🚀 Starting AS/400 Legacy Modernization Assistant Frontend...")
     
-    # Get the frontend directory
-    frontend_dir = Path(__file__).parent / "my-legacy-modernizer"
-    
-    if not frontend_dir.exists():
+    if not FRONTEND_DIR.exists():
         print("❌ Frontend directory not found!")
         return False
     
+    # A PATH lookup is enough to know npm exists, and also finds npm.cmd on Windows
+    npm_cmd = shutil.which("npm")
+    if npm_cmd is None:
+        print("❌ npm not found! Please install Node.js and npm first.")
+        return False
+    
     # Change to frontend directory
-    os.chdir(frontend_dir)
+    os.chdir(FRONTEND_DIR)
     
     try:
         print("🌐 Starting Next.js development server on http://localhost:3000")
         print("⏹️ Press Ctrl+C to stop the server")
         
         # Start the Next.js development server
-        subprocess.run(["npm", "run", "dev"])
+        subprocess.run([npm_cmd, "run", "dev"])
         
     except KeyboardInterrupt:
         print("\n✅ Frontend server stopped")
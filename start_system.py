@@ -4,12 +4,23 @@ AS/400 Legacy Modernization Assistant - Complete System Startup
 """
 
 import os
-import sys
+import select
+import shutil
 import subprocess
 import time
 import threading
 import requests
-from pathlib import Path
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from launcher import (BACKEND_DIR, BACKEND_LOG, FRONTEND_DIR, FRONTEND_LOG, poll_until, port_open,
+                      resolve_python, stop_process, wait_for_signal)
+
+# One keep-alive session for the readiness probes against both servers
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=2))
+
+# Fail fast when nothing is listening, but give a cold page compile time to answer
+PROBE_TIMEOUT = (0.2, 5)
 
 class SystemManager:
     def __init__(self):
@@ -20,7 +31,7 @@ class SystemManager:
     def check_backend(self):
         """Check if backend is running"""
         try:
-            response = requests.get("http://localhost:8000/", timeout=5)
+            response = SESSION.get("http://localhost:8000/", timeout=PROBE_TIMEOUT)
             return response.status_code == 200
         except:
             return False
@@ -28,74 +39,69 @@ class SystemManager:
     def check_frontend(self):
         """Check if frontend is running"""
         try:
-            response = requests.get("http://localhost:3000/", timeout=5)
+            response = SESSION.get("http://localhost:3000/", timeout=PROBE_TIMEOUT)
             return response.status_code == 200
         except:
             return False
     
+    def wait_ready(self, port, check, timeout):
+        """Wait for the port to open, then for the HTTP check to pass"""
+        deadline = time.monotonic() + timeout
+        
+        # Once the port is bound the HTTP check normally passes on the first try
+        return poll_until(lambda: port_open(port), deadline) and poll_until(check, deadline)
+    
     def start_backend(self):
-        """Start backend server"""
+        """Launch backend server without waiting for it"""
         print("🚀 Starting Backend Server...")
         
-        backend_dir = Path(__file__).parent / "backend"
-        os.chdir(backend_dir)
+        # start_system found no backend here, so a listener means another program holds the port
+        if port_open(8000):
+            print("❌ Port 8000 is already in use by another process")
+            return False
         
         try:
-            venv_python = backend_dir / "venv" / "Scripts" / "python.exe"
-            python_cmd = str(venv_python) if venv_python.exists() else sys.executable
-            
-            self.backend_process = subprocess.Popen([
-                python_cmd, "-m", "uvicorn", 
-                "main:app", 
-                "--host", "0.0.0.0", 
-                "--port", "8000", 
-                "--reload"
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            
-            # Wait for backend to start
-            for i in range(30):
-                if self.check_backend():
-                    print("✅ Backend started successfully")
-                    return True
-                time.sleep(1)
+            python_cmd = resolve_python(BACKEND_DIR)
             
-            print("❌ Backend failed to start")
-            return False
+            with open(BACKEND_LOG, "wb") as log:
+                self.backend_process = subprocess.Popen([
+                    python_cmd, "-m", "uvicorn", 
+                    "main:app", 
+                    "--host", "0.0.0.0", 
+                    "--port", "8000", 
+                    "--reload"
+                ], cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+            return True
             
         except Exception as e:
             print(f"❌ Error starting backend: {e}")
             return False
-        finally:
-            os.chdir(Path(__file__).parent)
     
     def start_frontend(self):
-        """Start frontend server"""
+        """Launch frontend server without waiting for it"""
         print("🚀 Starting Frontend Server...")
         
-        frontend_dir = Path(__file__).parent / "my-legacy-modernizer"
+        # start_system found no frontend here, so a listener means another program holds the port
+        if port_open(3000):
+            print("❌ Port 3000 is already in use by another process")
+            return False
         
-        try:
-            os.chdir(frontend_dir)
-            
-            self.frontend_process = subprocess.Popen([
-                "npm", "run", "dev"
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            
-            # Wait for frontend to start
-            for i in range(60):
-                if self.check_frontend():
-                    print("✅ Frontend started successfully")
-                    return True
-                time.sleep(1)
-            
-            print("❌ Frontend failed to start")
+        # A PATH lookup is enough to know npm exists, and also finds npm.cmd on Windows
+        npm_cmd = shutil.which("npm")
+        if npm_cmd is None:
+            print("❌ npm not found! Please install Node.js and npm first.")
             return False
+        
+        try:
+            with open(FRONTEND_LOG, "wb") as log:
+                self.frontend_process = subprocess.Popen([
+                    npm_cmd, "run", "dev"
+                ], cwd=FRONTEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+            return True
             
         except Exception as e:
             print(f"❌ Error starting frontend: {e}")
             return False
-        finally:
-            os.chdir(Path(__file__).parent)
     
     def start_system(self):
         """Start the complete system"""
@@ -106,17 +112,37 @@ class SystemManager:
         backend_running = self.check_backend()
         frontend_running = self.check_frontend()
         
+        # Launch whatever is not running yet, then wait for both together
+        pending = {}
         if backend_running:
             print("✅ Backend is already running")
+        elif self.start_backend():
+            pending["Backend"] = (8000, self.check_backend, 30)
         else:
-            if not self.start_backend():
-                return False
+            return False
         
         if frontend_running:
             print("✅ Frontend is already running")
+        elif self.start_frontend():
+            pending["Frontend"] = (3000, self.check_frontend, 60)
         else:
-            if not self.start_frontend():
-                return False
+            self.stop_system()
+            return False
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {name: executor.submit(self.wait_ready, *args) for name, args in pending.items()}
+        
+        ready = True
+        for name, future in futures.items():
+            if future.result():
+                print(f"✅ {name} started successfully")
+            else:
+                print(f"❌ {name} failed to start, see {name.lower()}.log")
+                ready = False
+        
+        if not ready:
+            self.stop_system()
+            return False
         
         print("\n🎉 System is ready!")
         print("📍 Frontend: http://localhost:3000")
@@ -125,22 +151,50 @@ class SystemManager:
         print("\n⏹️ Press Ctrl+C to stop the system")
         
         try:
-            while self.running:
-                time.sleep(1)
+            name = self.wait_for_exit()
+            print(f"\n\n❌ {name} exited, stopping system...")
         except KeyboardInterrupt:
             print("\n\n⏹️ Stopping system...")
-            self.stop_system()
+        self.stop_system()
         
         return True
     
+    def wait_for_exit(self):
+        """Block until Ctrl+C or one of our servers exits, and return the server's name"""
+        children = {"Backend": self.backend_process, "Frontend": self.frontend_process}
+        children = {name: process for name, process in children.items() if process}
+        
+        # A pidfd turns readable when its process exits, so select sleeps until then
+        if children and hasattr(os, "pidfd_open"):
+            try:
+                pidfds = {os.pidfd_open(process.pid): name for name, process in children.items()}
+            except OSError:
+                pidfds = {}
+            if pidfds:
+                try:
+                    ready, _, _ = select.select(list(pidfds), [], [])
+                    return pidfds[ready[0]]
+                finally:
+                    for fd in pidfds:
+                        os.close(fd)
+        
+        if not children:
+            wait_for_signal()
+        
+        while self.running:
+            for name, process in children.items():
+                if process.poll() is not None:
+                    return name
+            time.sleep(1)
+    
     def stop_system(self):
         """Stop all services"""
         if self.backend_process:
-            self.backend_process.terminate()
+            stop_process(self.backend_process)
             print("✅ Backend stopped")
         
         if self.frontend_process:
-            self.frontend_process.terminate()
+            stop_process(self.frontend_process)
             print("✅ Frontend stopped")
         
         print("✅ System stopped")
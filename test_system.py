@@ -9,12 +9,19 @@ import json
 import subprocess
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from launcher import BACKEND_LOG, FRONTEND_LOG, resolve_python, stop_process, wait_for_signal
+
+# One keep-alive session for every probe against the local services
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_maxsize=20))
 
 def test_backend_connection():
     """Test if backend is running"""
     try:
-        response = requests.get("http://localhost:8000/", timeout=5)
+        response = SESSION.get("http://localhost:8000/", timeout=5)
         if response.status_code == 200:
             print("✅ Backend is running")
             return True
@@ -31,7 +38,7 @@ def test_backend_connection():
 def test_frontend_connection():
     """Test if frontend is running"""
     try:
-        response = requests.get("http://localhost:3000/", timeout=5)
+        response = SESSION.get("http://localhost:3000/", timeout=5)
         if response.status_code == 200:
             print("✅ Frontend is running")
             return True
@@ -45,41 +52,59 @@ def test_frontend_connection():
         print(f"❌ Frontend test error: {e}")
         return False
 
-def test_api_endpoints():
-    """Test API endpoints"""
-    print("\n🧪 Testing API endpoints...")
-    
-    # Test root endpoint
+def wait_ready(url, timeout, process=None, initial=0.025, cap=0.5):
+    """Poll url with backoff until it answers 200, the process exits or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    delay = initial
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            if SESSION.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(delay)
+        delay = min(cap, delay * 2)
+    return False
+
+def probe_root():
+    """Check the root endpoint"""
     try:
-        response = requests.get("http://localhost:8000/")
+        response = SESSION.get("http://localhost:8000/")
         if response.status_code == 200:
             print("✅ Root endpoint working")
+            return True
         else:
             print("❌ Root endpoint failed")
             return False
     except Exception as e:
         print(f"❌ Root endpoint error: {e}")
         return False
-    
-    # Test dashboard endpoint
+
+def probe_dashboard():
+    """Check the dashboard endpoint"""
     try:
-        response = requests.get("http://localhost:8000/dashboard")
+        response = SESSION.get("http://localhost:8000/dashboard")
         if response.status_code == 200:
             print("✅ Dashboard endpoint working")
+            return True
         else:
             print("❌ Dashboard endpoint failed")
             return False
     except Exception as e:
         print(f"❌ Dashboard endpoint error: {e}")
         return False
-    
+
+def probe_upload_transform():
+    """Upload sample data, then transform it"""
     # Test file upload with sample data
     try:
         sample_data = """CUST001JOHN DOE    123 MAIN ST    NEW YORK    NY10001 555-0123
 CUST002JANE SMITH  456 OAK AVE   CHICAGO     IL60601 555-0456"""
         
         files = {"file": ("test_customers.txt", sample_data, "text/plain")}
-        response = requests.post("http://localhost:8000/upload", files=files)
+        response = SESSION.post("http://localhost:8000/upload", files=files)
         
         if response.status_code == 200:
             data = response.json()
@@ -88,7 +113,7 @@ CUST002JANE SMITH  456 OAK AVE   CHICAGO     IL60601 555-0456"""
                 legacy_id = data["legacy_id"]
                 
                 # Test transformation
-                transform_response = requests.post(f"http://localhost:8000/transform/{legacy_id}")
+                transform_response = SESSION.post(f"http://localhost:8000/transform/{legacy_id}")
                 if transform_response.status_code == 200:
                     transform_data = transform_response.json()
                     if transform_data.get("success"):
@@ -110,46 +135,43 @@ CUST002JANE SMITH  456 OAK AVE   CHICAGO     IL60601 555-0456"""
         print(f"❌ Upload test error: {e}")
         return False
 
+def test_api_endpoints():
+    """Test API endpoints"""
+    print("\n🧪 Testing API endpoints...")
+    
+    # The three checks are independent, so run them side by side
+    probes = (probe_root, probe_dashboard, probe_upload_transform)
+    with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+        results = list(executor.map(lambda probe: probe(), probes))
+    return all(results)
+
 def start_backend():
     """Start backend server"""
     print("🚀 Starting backend server...")
     
-    # Store current directory
-    original_dir = os.getcwd()
-    
-    # Change to backend directory
-    os.chdir("backend")
-    
     try:
         # Use virtual environment python
-        venv_python = os.path.join("venv", "Scripts", "python.exe")
-        if os.path.exists(venv_python):
-            python_cmd = venv_python
-        else:
-            python_cmd = sys.executable
+        python_cmd = resolve_python(Path("backend").resolve())
         
-        # Start backend in background
-        process = subprocess.Popen([python_cmd, "main.py"], 
-                                 stdout=subprocess.PIPE, 
-                                 stderr=subprocess.PIPE)
+        # Start backend in background without changing our own directory
+        with open(BACKEND_LOG, "wb") as log:
+            process = subprocess.Popen([python_cmd, "main.py"], 
+                                     cwd="backend",
+                                     stdout=log, 
+                                     stderr=subprocess.STDOUT)
         
-        # Restore original directory
-        os.chdir(original_dir)
-        
-        # Wait a moment for startup
-        time.sleep(5)
-        
-        # Check if process is still running
-        if process.poll() is None:
+        # Poll until the server answers instead of sleeping a fixed time
+        if wait_ready("http://localhost:8000/", 30, process):
             print("✅ Backend started successfully")
             return process
+        elif process.poll() is None:
+            stop_process(process)
+            print("❌ Backend did not become ready in time")
+            return None
         else:
-            stdout, stderr = process.communicate()
-            print(f"❌ Backend failed to start: {stderr.decode()}")
+            print(f"❌ Backend failed to start: {BACKEND_LOG.read_text(errors='replace')}")
             return None
     except Exception as e:
-        # Restore original directory on error
-        os.chdir(original_dir)
         print(f"❌ Error starting backend: {e}")
         return None
 
@@ -157,40 +179,31 @@ def start_frontend():
     """Start frontend server"""
     print("🚀 Starting frontend server...")
     
-    # Store current directory
-    original_dir = os.getcwd()
-    
-    # Change to frontend directory
     frontend_dir = "my-legacy-modernizer"
     if not os.path.exists(frontend_dir):
         print(f"❌ Frontend directory '{frontend_dir}' not found")
         return None
     
-    os.chdir(frontend_dir)
-    
     try:
         # Start frontend in background
-        process = subprocess.Popen(["npm", "run", "dev"], 
-                                 stdout=subprocess.PIPE, 
-                                 stderr=subprocess.PIPE)
+        with open(FRONTEND_LOG, "wb") as log:
+            process = subprocess.Popen(["npm", "run", "dev"], 
+                                     cwd=frontend_dir,
+                                     stdout=log, 
+                                     stderr=subprocess.STDOUT)
         
-        # Restore original directory
-        os.chdir(original_dir)
-        
-        # Wait a moment for startup
-        time.sleep(10)
-        
-        # Check if process is still running
-        if process.poll() is None:
+        # Poll until the server answers instead of sleeping a fixed time
+        if wait_ready("http://localhost:3000/", 60, process):
             print("✅ Frontend started successfully")
             return process
+        elif process.poll() is None:
+            stop_process(process)
+            print("❌ Frontend did not become ready in time")
+            return None
         else:
-            stdout, stderr = process.communicate()
-            print(f"❌ Frontend failed to start: {stderr.decode()}")
+            print(f"❌ Frontend failed to start: {FRONTEND_LOG.read_text(errors='replace')}")
             return None
     except Exception as e:
-        # Restore original directory on error
-        os.chdir(original_dir)
         print(f"❌ Error starting frontend: {e}")
         return None
 
@@ -204,44 +217,31 @@ def main():
         print("❌ Please run this script from the project root directory")
         return False
     
-    # Test if services are already running
-    backend_running = test_backend_connection()
-    frontend_running = test_frontend_connection()
+    # Test if services are already running, checking both at once
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        backend_check = executor.submit(test_backend_connection)
+        frontend_check = executor.submit(test_frontend_connection)
+    backend_running = backend_check.result()
+    frontend_running = frontend_check.result()
     
-    backend_process = None
-    frontend_process = None
+    # Start whichever services are not running yet, side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        backend_future = None if backend_running else executor.submit(start_backend)
+        frontend_future = None if frontend_running else executor.submit(start_frontend)
+    backend_process = backend_future.result() if backend_future else None
+    frontend_process = frontend_future.result() if frontend_future else None
     
-    # Start backend if not running
-    if not backend_running:
-        backend_process = start_backend()
-        if not backend_process:
-            print("❌ Failed to start backend")
-            return False
-        
-        # Wait for backend to be ready
-        for i in range(10):
-            if test_backend_connection():
-                break
-            time.sleep(2)
-        else:
-            print("❌ Backend failed to start properly")
-            return False
+    if backend_future and not backend_process:
+        print("❌ Failed to start backend")
+        if frontend_process:
+            stop_process(frontend_process)
+        return False
     
-    # Start frontend if not running
-    if not frontend_running:
-        frontend_process = start_frontend()
-        if not frontend_process:
-            print("❌ Failed to start frontend")
-            return False
-        
-        # Wait for frontend to be ready
-        for i in range(15):
-            if test_frontend_connection():
-                break
-            time.sleep(2)
-        else:
-            print("❌ Frontend failed to start properly")
-            return False
+    if frontend_future and not frontend_process:
+        print("❌ Failed to start frontend")
+        if backend_process:
+            stop_process(backend_process)
+        return False
     
     # Test API endpoints
     if not test_api_endpoints():
@@ -257,19 +257,18 @@ def main():
     print("\n⏹️ Press Ctrl+C to stop the system")
     
     try:
-        # Keep running until interrupted
-        while True:
-            time.sleep(1)
+        # Keep running until interrupted, without waking up every second
+        wait_for_signal()
     except KeyboardInterrupt:
         print("\n\n⏹️ Stopping system...")
         
         # Stop processes if we started them
         if backend_process:
-            backend_process.terminate()
+            stop_process(backend_process)
             print("✅ Backend stopped")
         
         if frontend_process:
-            frontend_process.terminate()
+            stop_process(frontend_process)
             print("✅ Frontend stopped")
         
         print("✅ System stopped")
@@ -277,4 +276,5 @@ def main():
     return True
 
 if __name__ == "__main__":
-    main()
+    with SESSION:
+        main()